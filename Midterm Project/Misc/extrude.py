@@ -1,49 +1,25 @@
 import bpy
 import math
 import numpy as np
+import os
+import sys
 
-def v_index(i, j, n):
-    return i * n + j
+# The shared modules live at the root of the repository, two folders up
+sys.path.append(os.path.join(os.path.dirname(bpy.data.filepath), os.pardir, os.pardir))
+from common.mesh import write_mesh
+from common.topology import grid_topology
 
 def interpolate_mesh(start_vertices, end_vertices, iterations):
-    vertices = []
-    edges = []
-    faces = []
-
     difference_vectors = end_vertices - start_vertices
     n = len(start_vertices)
 
-    for i in range(0, iterations + 1):
-        for j in range(0, n):
-            start_v = start_vertices[j]
-            diff_v = difference_vectors[j]
-
-            vertex = start_v + (1.0 * i / iterations) * diff_v
-
-            vertices.append(list(vertex))
-
-    for i in range(0, iterations + 1):
-        for j in range(0, n):
-            bottom_left = v_index(i, j, n)
-            bottom_right = v_index(i, (j + 1) % n, n)
-
-            edges.append([bottom_left, bottom_right])
-
-            if i < iterations:
-                top_left = v_index(i + 1, j, n)
-                top_right = v_index(i + 1, (j+1) % n, n)
-
-                edges += [
-                    [bottom_left, top_left], 
-                    [bottom_right, top_right], 
-                    [top_left, top_right]
-                ]
+    t = np.arange(iterations + 1)[:, None, None] / iterations
+    vertices = (start_vertices[None] + t * difference_vectors[None]).reshape(-1, 3)
 
-                faces.append([bottom_left, bottom_right, top_right, top_left])
+    edges, faces, caps = grid_topology(iterations + 1, n, closed=True)
 
     new_mesh = bpy.data.meshes.new('new_mesh')
-    new_mesh.from_pydata(vertices, edges, faces)
-    new_mesh.update()
+    write_mesh(new_mesh, vertices, edges, faces)
 
     new_object = bpy.data.objects.new('new_object', new_mesh)
 
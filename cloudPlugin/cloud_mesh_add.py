@@ -1,12 +1,45 @@
 import bpy
 import bmesh
+from bpy.app.handlers import persistent
 from bpy_extras.object_utils import AddObjectHelper
 
 from bpy.props import (
+    BoolProperty,
+    EnumProperty,
     FloatProperty,
     FloatVectorProperty,
+    IntProperty,
+    StringProperty,
 )
 
+import json
+import math
+import os
+import sys
+
+# OpenVDB's Python module is called openvdb in Blender 4 and pyopenvdb before
+try:
+    import openvdb as vdb
+except ImportError:
+    try:
+        import pyopenvdb as vdb
+    except ImportError:
+        vdb = None
+
+
+
+def import_volume_cache():
+    """
+    VolumeCache from the shared modules at the root of the repository, next
+    to this folder. Only baking needs them, so they are imported when a
+    bake runs and the add-on still works from a .blend saved elsewhere.
+    """
+    folder = os.path.join(os.path.dirname(bpy.data.filepath), os.pardir)
+    if folder not in sys.path:
+        sys.path.append(folder)
+    from common.volume_cache import VolumeCache
+    return VolumeCache
+
 
 def add_box(width, height, depth):
     """
@@ -41,6 +74,168 @@ def add_box(width, height, depth):
     return verts, faces
 
 
+def bake_shape(width, height, depth, resolution):
+    """
+    Voxel counts along x, y and z for a box, with resolution voxels along
+    its longest side.
+    """
+    sizes = (width, depth, height)
+    longest = max(sizes)
+    return tuple(max(1, round(resolution * size / longest)) for size in sizes)
+
+
+def write_vdb(path, volume, width, height, depth):
+    """
+    Writes a baked volume as a float grid called density, placed so that it
+    fills the box around the object's origin.
+    """
+    import numpy as np
+
+    nx, ny, nz = volume.shape
+    sx, sy, sz = 2 * width / nx, 2 * depth / ny, 2 * height / nz
+
+    grid = vdb.FloatGrid()
+    grid.copyFromArray(np.ascontiguousarray(volume, dtype=np.float32))
+    grid.name = "density"
+    # Voxel centers sit at integer index coordinates
+    grid.transform = vdb.createLinearTransform([
+        [sx, 0, 0, 0],
+        [0, sy, 0, 0],
+        [0, 0, sz, 0],
+        [-width + sx / 2, -depth + sy / 2, -height + sz / 2, 1],
+    ])
+    vdb.write(path, grids=[grid])
+
+
+def atlas_layout(nz):
+    """
+    Columns and rows of the grid write_atlas lays nz slices out in.
+    """
+    columns = math.ceil(math.sqrt(nz))
+    return columns, math.ceil(nz / columns)
+
+
+def write_atlas(path, volume):
+    """
+    Lays the z slices of a baked volume side by side in one float image, as
+    Cycles has no 3D image textures. Returns the image and its columns and
+    rows of slices.
+    """
+    import numpy as np
+
+    nx, ny, nz = volume.shape
+    columns, rows = atlas_layout(nz)
+
+    pixels = np.zeros((rows * ny, columns * nx, 4), dtype=np.float32)
+    pixels[..., 3] = 1
+    for k in range(nz):
+        row, column = divmod(k, columns)
+        pixels[row * ny:(row + 1) * ny, column * nx:(column + 1) * nx, 0:3] = volume[:, :, k].T[..., None]
+
+    image = (bpy.data.images.get(os.path.basename(path)) or
+        bpy.data.images.new(os.path.basename(path), columns * nx, rows * ny, alpha=False, float_buffer=True))
+    image.scale(columns * nx, rows * ny)
+    image.pixels.foreach_set(pixels.ravel())
+    image.colorspace_settings.name = 'Non-Color'
+    image.filepath_raw = path
+    image.file_format = 'OPEN_EXR'
+    image.save()
+
+    return image, columns, rows
+
+
+def add_math(nodes, links, operation, a, b, location):
+    """
+    Adds a math node taking a and b, each a socket or a number.
+    """
+    node = nodes.new("ShaderNodeMath")
+    node.operation = operation
+    node.location = location
+    for socket, value in zip(node.inputs, (a, b)):
+        if isinstance(value, bpy.types.NodeSocket):
+            links.new(value, socket)
+        else:
+            socket.default_value = value
+    return node.outputs[0]
+
+
+def add_atlas_nodes(nodes, links, coordinates, image, columns, rows, depth):
+    """
+    Samples an atlas from write_atlas at coordinates running from 0 to 1
+    across the baked volume, picking the slice nearest to each point.
+    Returns the value socket.
+    """
+    separateNode = nodes.new("ShaderNodeSeparateXYZ")
+    separateNode.location = (-2300, 0)
+    links.new(coordinates, separateNode.inputs[0])
+    x, y, z = separateNode.outputs
+
+    # Index of the slice, then its column and row in the atlas
+    index = add_math(nodes, links, 'MULTIPLY', z, depth, (-2100, -200))
+    index = add_math(nodes, links, 'FLOOR', index, 0, (-1900, -200))
+    index = add_math(nodes, links, 'MINIMUM', index, depth - 1, (-1700, -200))
+    column = add_math(nodes, links, 'MODULO', index, columns, (-1500, -100))
+    row = add_math(nodes, links, 'DIVIDE', index, columns, (-1500, -300))
+    row = add_math(nodes, links, 'FLOOR', row, 0, (-1300, -300))
+
+    u = add_math(nodes, links, 'ADD', column, x, (-1300, 100))
+    u = add_math(nodes, links, 'DIVIDE', u, columns, (-1100, 100))
+    v = add_math(nodes, links, 'ADD', row, y, (-1100, -100))
+    v = add_math(nodes, links, 'DIVIDE', v, rows, (-900, -100))
+
+    combineNode = nodes.new("ShaderNodeCombineXYZ")
+    combineNode.location = (-700, 0)
+    links.new(u, combineNode.inputs[0])
+    links.new(v, combineNode.inputs[1])
+
+    imageNode = nodes.new("ShaderNodeTexImage")
+    imageNode.name = "Cloud Slice"
+    imageNode.location = (-500, 0)
+    imageNode.image = image
+    imageNode.interpolation = 'Linear'
+    imageNode.extension = 'EXTEND'
+    links.new(combineNode.outputs[0], imageNode.inputs[0])
+
+    return imageNode.outputs[0]
+
+
+def slice_image(settings, frame):
+    """
+    The atlas of the cached turbulence slice for a frame of a cloud
+    animation, baked first if it isn't cached.
+    """
+    frame = min(max(frame, 0), settings["last_frame"])
+    VolumeCache = import_volume_cache()
+    cache = VolumeCache(settings["folder"], settings["shape"], settings["bounds"],
+        time_step=settings["time_step"], max_bytes=settings["max_bytes"])
+    key, volume = cache.get(settings["end_time"] * frame / settings["last_frame"], evict=False)
+
+    path = cache.path(key, ".exr")
+    if os.path.exists(path):
+        return bpy.data.images.load(path, check_existing=True)
+
+    # Evicting only once the atlas is written counts it in the budget
+    image = write_atlas(path, volume)[0]
+    cache.evict(key)
+    return image
+
+
+@persistent
+def update_cloud_slices(scene, depsgraph=None):
+    """
+    Swaps the turbulence slice of every baked cloud material for the one
+    of the current frame.
+    """
+    for mat in bpy.data.materials:
+        if "cloud_bake" not in mat or not mat.node_tree:
+            continue
+        node = mat.node_tree.nodes.get("Cloud Slice")
+        if node:
+            image = slice_image(json.loads(mat["cloud_bake"]), scene.frame_current)
+            if node.image != image:
+                node.image = image
+
+
 class AddClouds(bpy.types.Operator, AddObjectHelper):
     """Add a simple cloud mesh"""
     bl_idname = "mesh.primitive_clouds_add"
@@ -88,36 +283,160 @@ class AddClouds(bpy.types.Operator, AddObjectHelper):
         description="Direction cloud texture will move within the volume",
         default=[3.0,2.0,1.0],
     )
+    bake: BoolProperty(
+        name="Bake Volume",
+        description="Bake the turbulence into a volume texture instead of evaluating the OSL script at every sample",
+        default=False,
+    )
+    bake_format: EnumProperty(
+        name="Bake Format",
+        description="File the baked turbulence is stored in",
+        items=[
+            ('VDB', "OpenVDB", "A density grid loaded as a volume object"),
+            ('ATLAS', "Image Atlas", "Animated time slices, each with its z slices side by side in one EXR image, sampled by the box material"),
+        ],
+        default='VDB',
+    )
+    resolution: IntProperty(
+        name="Resolution",
+        description="Voxels along the longest side of the baked volume",
+        min=8, max=1024,
+        default=128,
+    )
+    time_step: FloatProperty(
+        name="Time Step",
+        description="Time between baked slices of the animated texture, frames in between use the nearest one",
+        min=0.0001, max=1.0,
+        default=0.001,
+        precision=4,
+    )
+    cache_size: IntProperty(
+        name="Cache Size",
+        description="Megabytes of baked slices kept on disk before the least recently used are deleted",
+        min=64,
+        default=2048,
+    )
+    cache_dir: StringProperty(
+        name="Cache Folder",
+        description="Folder the baked volumes are written to",
+        subtype='DIR_PATH',
+        default="//clouds_cache/",
+    )
+
+    def bake_turbulence(self, context):
+        """
+        Bakes the first frame of the turbulence the script node would
+        compute over the box, with the shader's default pixel size. The bake
+        is a slice of the same cache the animated bakes use, so it is keyed
+        by its settings and evicted within the same size limit. Returns the
+        cache and the key and volume of the slice.
+        """
+        VolumeCache = import_volume_cache()
+
+        # point Point = P / scale + translation;
+        x, y, z = self.location
+        bounds = [
+            ((x - self.width) / self.scale, (x + self.width) / self.scale),
+            ((y - self.depth) / self.scale, (y + self.depth) / self.scale),
+            ((z - self.height) / self.scale, (z + self.height) / self.scale),
+        ]
+        shape = bake_shape(self.width, self.height, self.depth, self.resolution)
+
+        cache = VolumeCache(bpy.path.abspath(self.cache_dir), shape, bounds, max_bytes=self.cache_size << 20)
+        key, volume = cache.get(0.0, evict=False)
+        return cache, key, volume
+
+    def cache_settings(self, end_time, end_translation, last_frame):
+        """
+        Settings of the slice cache for an animated atlas. Each slice covers
+        every point of noise space the box passes over as the wind moves it,
+        at the voxel size resolution gives the box itself, so one slice
+        serves all the frames it spans whatever their translation.
+        """
+        import numpy as np
+
+        folder = bpy.path.abspath(self.cache_dir)
+        os.makedirs(folder, exist_ok=True)
+
+        # point Point = P / scale + translation;
+        x, y, z = self.location
+        low = np.array([x - self.width, y - self.depth, z - self.height]) / self.scale
+        high = np.array([x + self.width, y + self.depth, z + self.height]) / self.scale
+        bounds = np.stack([
+            np.minimum(low, low + end_translation),
+            np.maximum(high, high + end_translation),
+        ], axis=1)
+
+        voxel = (high - low).max() / self.resolution
+        shape = [max(1, int(round(size))) for size in (bounds[:, 1] - bounds[:, 0]) / voxel]
+
+        return {
+            "folder": folder,
+            "shape": shape,
+            "bounds": bounds.tolist(),
+            "time_step": self.time_step,
+            "max_bytes": self.cache_size << 20,
+            "end_time": end_time,
+            "last_frame": last_frame,
+        }
 
     def execute(self, context):
+        from bpy_extras import object_utils
+
+        bake_format = self.bake_format if self.bake else None
+        if bake_format == 'VDB' and vdb is None:
+            self.report({'WARNING'}, "OpenVDB is not available, baking an image atlas instead")
+            bake_format = 'ATLAS'
+
+        time_rate = self.time_rate
+        wind_rate = self.wind_rate
+        wind_direction = self.wind_direction
+        runtime = 10
+        fps = 24
 
-        verts_loc, faces = add_box(
-            self.width,
-            self.height,
-            self.depth,
-        )
+        lastFrame = int(runtime * fps)
+        end_time = runtime / 1000 * time_rate
+        wind_rate *= runtime / 10
+        end_translation = [-x * wind_rate for x in wind_direction]
 
-        mesh = bpy.data.meshes.new("Clouds")
+        if bake_format == 'VDB':
+            cache, key, volume = self.bake_turbulence(context)
+            vdb_path = cache.path(key, ".vdb")
+            write_vdb(vdb_path, volume, self.width, self.height, self.depth)
+            cache.evict(key)
 
-        bm = bmesh.new()
+            volume_data = bpy.data.volumes.new("Clouds")
+            volume_data.filepath = vdb_path
+            cloudObject = object_utils.object_data_add(context, volume_data, operator=self)
+        else:
+            verts_loc, faces = add_box(
+                self.width,
+                self.height,
+                self.depth,
+            )
 
-        for v_co in verts_loc:
-            bm.verts.new(v_co)
+            mesh = bpy.data.meshes.new("Clouds")
 
-        bm.verts.ensure_lookup_table()
-        for f_idx in faces:
-            bm.faces.new([bm.verts[i] for i in f_idx])
+            bm = bmesh.new()
 
-        bm.to_mesh(mesh)
-        mesh.update()
+            for v_co in verts_loc:
+                bm.verts.new(v_co)
 
-        # add the mesh as an object into the scene with this utility module
-        from bpy_extras import object_utils
-        cloudObject = object_utils.object_data_add(context, mesh, operator=self)
+            bm.verts.ensure_lookup_table()
+            for f_idx in faces:
+                bm.faces.new([bm.verts[i] for i in f_idx])
+
+            bm.to_mesh(mesh)
+            mesh.update()
+
+            # add the mesh as an object into the scene with this utility module
+            cloudObject = object_utils.object_data_add(context, mesh, operator=self)
 
         # Add cloud texture to mesh
         bpy.context.scene.render.engine = 'CYCLES'
-        bpy.context.scene.cycles.shading_system = True
+        # Only the script node needs OSL, baked volumes also render on the GPU
+        if bake_format is None:
+            bpy.context.scene.cycles.shading_system = True
 
         mat_name = "Clouds"
 
@@ -136,10 +455,44 @@ class AddClouds(bpy.types.Operator, AddObjectHelper):
             nodes.remove(node)
 
         # Create new nodes
-        scriptNode = nodes.new('ShaderNodeScript')
-        scriptNode.location = (-300,0)
-        scriptNode.script = bpy.data.texts["turbulence.osl"]
-        scriptNode.inputs[4].default_value = self.scale
+        if bake_format == 'VDB':
+            # Volume objects expose their grids as attributes
+            attributeNode = nodes.new("ShaderNodeAttribute")
+            attributeNode.location = (-300,0)
+            attributeNode.attribute_name = "density"
+            turbulence = attributeNode.outputs["Fac"]
+        elif bake_format == 'ATLAS':
+            import numpy as np
+
+            settings = self.cache_settings(end_time, end_translation, lastFrame)
+            # The frame change handler finds the slices through this
+            mat["cloud_bake"] = json.dumps(settings)
+            # Bake every slice of the animation up front, so playback only
+            # swaps images
+            for frame in range(lastFrame + 1):
+                slice_image(settings, frame)
+
+            geometryNode = nodes.new("ShaderNodeNewGeometry")
+            geometryNode.location = (-2900, 0)
+
+            # Moves world positions into the baked region, the translation
+            # picking out the part of it under the box on each frame
+            low = np.array(settings["bounds"])[:, 0]
+            size = np.array(settings["bounds"])[:, 1] - low
+            mappingNode = nodes.new("ShaderNodeMapping")
+            mappingNode.location = (-2700, 0)
+            mappingNode.vector_type = 'POINT'
+            mappingNode.inputs["Scale"].default_value = (1 / (self.scale * size)).tolist()
+            links.new(geometryNode.outputs["Position"], mappingNode.inputs[0])
+
+            columns, rows = atlas_layout(settings["shape"][2])
+            turbulence = add_atlas_nodes(nodes, links, mappingNode.outputs[0], slice_image(settings, 0), columns, rows, settings["shape"][2])
+        else:
+            scriptNode = nodes.new('ShaderNodeScript')
+            scriptNode.location = (-300,0)
+            scriptNode.script = bpy.data.texts["turbulence.osl"]
+            scriptNode.inputs[4].default_value = self.scale
+            turbulence = scriptNode.outputs[0]
 
         colorRampNode = nodes.new(type="ShaderNodeValToRGB")
         colorRampNode.color_ramp.elements[0].color = (0, 0, 0, 1)
@@ -159,7 +512,7 @@ class AddClouds(bpy.types.Operator, AddObjectHelper):
 
 
         # Connect the two nodes
-        links.new(scriptNode.outputs[0], colorRampNode.inputs[0])
+        links.new(turbulence, colorRampNode.inputs[0])
         links.new(colorRampNode.outputs[0], volumeNode.inputs[2])
         links.new(volumeNode.outputs[0], outNode.inputs[1])
 
@@ -168,15 +521,12 @@ class AddClouds(bpy.types.Operator, AddObjectHelper):
         cloudObject.data.materials.append(mat)
         cloudObject.data.materials[0] = mat
 
+        # A VDB volume is a single moment of the texture
+        if bake_format == 'VDB':
+            return {'FINISHED'}
+
         # Add keyframes to clouds
         
-        time_rate = self.time_rate
-        wind_rate = self.wind_rate
-        wind_direction = self.wind_direction
-        runtime = 10
-        fps = 24
-        
-        lastFrame = int(runtime * fps)
         bpy.context.scene.frame_start = 0
         bpy.context.scene.frame_end = lastFrame
         
@@ -184,22 +534,30 @@ class AddClouds(bpy.types.Operator, AddObjectHelper):
         # 
         # First frame
         bpy.context.scene.frame_set(0)
-        # Set time value of texture
-        scriptNode.inputs[1].default_value = 0
-        scriptNode.inputs[1].keyframe_insert("default_value")
-        # Set 3D translation of texture within the volume
-        scriptNode.inputs[3].default_value = [0, 0, 0]
-        scriptNode.inputs[3].keyframe_insert("default_value")
+        if bake_format == 'ATLAS':
+            # Time is picked by the frame change handler, only the translation is keyframed
+            mappingNode.inputs["Location"].default_value = (-low / size).tolist()
+            mappingNode.inputs["Location"].keyframe_insert("default_value")
+        else:
+            # Set time value of texture
+            scriptNode.inputs[1].default_value = 0
+            scriptNode.inputs[1].keyframe_insert("default_value")
+            # Set 3D translation of texture within the volume
+            scriptNode.inputs[3].default_value = [0, 0, 0]
+            scriptNode.inputs[3].keyframe_insert("default_value")
 
         # Last frame
         bpy.context.scene.frame_set(lastFrame)
-        # Set time value of texture
-        scriptNode.inputs[1].default_value = runtime / 1000 * time_rate
-        scriptNode.inputs[1].keyframe_insert("default_value")
-        # Set 3D translation of texture within the volume
-        wind_rate *= runtime / 10
-        scriptNode.inputs[3].default_value = [-x * wind_rate for x in wind_direction]
-        scriptNode.inputs[3].keyframe_insert("default_value")
+        if bake_format == 'ATLAS':
+            mappingNode.inputs["Location"].default_value = ((end_translation - low) / size).tolist()
+            mappingNode.inputs["Location"].keyframe_insert("default_value")
+        else:
+            # Set time value of texture
+            scriptNode.inputs[1].default_value = end_time
+            scriptNode.inputs[1].keyframe_insert("default_value")
+            # Set 3D translation of texture within the volume
+            scriptNode.inputs[3].default_value = end_translation
+            scriptNode.inputs[3].keyframe_insert("default_value")
 
         # Set to linear interpolation
         area = bpy.context.area
@@ -221,11 +579,13 @@ def menu_func(self, context):
 def register():
     bpy.utils.register_class(AddClouds)
     bpy.types.VIEW3D_MT_mesh_add.append(menu_func)
+    bpy.app.handlers.frame_change_pre.append(update_cloud_slices)
 
 
 def unregister():
     bpy.utils.unregister_class(AddClouds)
     bpy.types.VIEW3D_MT_mesh_add.remove(menu_func)
+    bpy.app.handlers.frame_change_pre.remove(update_cloud_slices)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+# A headless stand-in for the small part of the bpy API the mesh writers use,
+# so generators and common.mesh can be exercised without Blender:
+#
+#     from common import bpy_stub
+#     bpy_stub.install()
+#
+# Meshes keep what is written to them as flat NumPy arrays, which can be read
+# back with foreach_get just like in Blender.
+import sys
+import types as _types
+
+import numpy as np
+
+class PropertyCollection(object):
+    # A bpy_prop_collection of mesh elements with fixed-size float or int
+    # fields, which new elements get defaults, or zeros, in
+    def __init__(self, fields, defaults=None):
+        self.fields = fields
+        self.defaults = defaults or {}
+        self.size = 0
+        self.values = {name: np.zeros(0, dtype) for name, (width, dtype) in fields.items()}
+
+    def __len__(self):
+        return self.size
+
+    def add(self, count):
+        self.size += count
+        for name, (width, dtype) in self.fields.items():
+            grown = np.full(self.size * width, self.defaults.get(name, 0), dtype)
+            grown[:len(self.values[name])] = self.values[name]
+            self.values[name] = grown
+
+    def foreach_set(self, name, seq):
+        width, dtype = self.fields[name]
+        seq = np.asarray(seq, dtype=dtype).ravel()
+        if len(seq) != self.size * width:
+            raise TypeError("foreach_set(): array length mismatch for '{0}' (expected {1}, got {2})".format(name, self.size * width, len(seq)))
+        self.values[name] = seq.copy()
+
+    def foreach_get(self, name, seq):
+        seq[:] = self.values[name]
+
+class AttributeData(object):
+    def __init__(self, size):
+        self.values = np.zeros(size * 3, dtype=np.float32)
+
+    def foreach_set(self, name, seq):
+        self.values[:] = np.asarray(seq, dtype=np.float32).ravel()
+
+class Attributes(dict):
+    def __init__(self, mesh):
+        super().__init__()
+        self.mesh = mesh
+
+    def new(self, name, type, domain):
+        attribute = _types.SimpleNamespace(name=name, data_type=type, domain=domain, data=AttributeData(len(self.mesh.vertices)))
+        self[name] = attribute
+        return attribute
+
+class Mesh(object):
+    def __init__(self, name):
+        self.name = name
+        self.vertices = PropertyCollection({'co': (3, np.float32)})
+        self.edges = PropertyCollection({'vertices': (2, np.int32)})
+        # Loops are left without an edge until update() works them out
+        self.loops = PropertyCollection({'vertex_index': (1, np.int32), 'edge_index': (1, np.int32)}, {'edge_index': -1})
+        self.polygons = PropertyCollection({'loop_start': (1, np.int32), 'loop_total': (1, np.int32)})
+        self.attributes = Attributes(self)
+        self.materials = []
+
+    def from_pydata(self, vertices, edges, faces):
+        from common.mesh import write_mesh
+        write_mesh(self, vertices, edges, faces)
+
+    def update(self, calc_edges=False, calc_edges_loose=False):
+        starts = self.polygons.values['loop_start']
+        totals = self.polygons.values['loop_total']
+        if len(starts) and not np.array_equal(starts, np.cumsum(totals) - totals):
+            raise ValueError("Mesh '{0}' has polygons with inconsistent loops".format(self.name))
+
+        if calc_edges:
+            self.calc_loop_edges(starts, totals)
+
+        if np.any(self.loops.values['edge_index'] < 0):
+            raise ValueError("Mesh '{0}' has loops that aren't linked to an edge".format(self.name))
+
+    def calc_loop_edges(self, starts, totals):
+        # Links every polygon corner to the edge to the next corner, adding
+        # the edges that don't exist yet, as Blender does for calc_edges
+        loop_vertices = self.loops.values['vertex_index']
+        loops = np.arange(len(loop_vertices))
+        polygon = np.repeat(np.arange(len(starts)), totals)
+        following = np.where(loops + 1 == starts[polygon] + totals[polygon], starts[polygon], loops + 1)
+        corners = np.sort(np.stack([loop_vertices, loop_vertices[following]], axis=1), axis=1)
+
+        existing = self.edges.values['vertices'].reshape(-1, 2)
+        edge_indices = {}
+        for edge, key in enumerate(map(tuple, np.sort(existing, axis=1).tolist())):
+            edge_indices.setdefault(key, edge)
+
+        # Existing edges keep their indices, new ones are appended in order
+        new = []
+        loop_edges = np.empty(len(loops), dtype=np.int32)
+        for loop, key in enumerate(map(tuple, corners.tolist())):
+            if key not in edge_indices:
+                edge_indices[key] = len(existing) + len(new)
+                new.append(key)
+            loop_edges[loop] = edge_indices[key]
+
+        if new:
+            self.edges.add(len(new))
+            self.edges.values['vertices'][2 * len(existing):] = np.ravel(new)
+
+        self.loops.values['edge_index'] = loop_edges
+
+class Object(object):
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.hide_render = False
+        self.hidden = False
+        self.users_collection = []
+        self.modifiers = _types.SimpleNamespace(new=lambda name, type: _types.SimpleNamespace(name=name, type=type, node_group=None))
+
+    def hide_set(self, state):
+        self.hidden = state
+
+class Collection(object):
+    def __init__(self, name):
+        self.name = name
+        self.objects = _types.SimpleNamespace(link=self.link_object)
+        self.children = _types.SimpleNamespace(link=lambda collection: None)
+        self.linked = []
+
+    def link_object(self, obj):
+        self.linked.append(obj)
+        obj.users_collection.append(self)
+
+class DataBlocks(list):
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+
+    def new(self, *args):
+        block = self.factory(*args)
+        self.append(block)
+        return block
+
+data = _types.SimpleNamespace(
+    filepath='',
+    meshes=DataBlocks(Mesh),
+    objects=DataBlocks(Object),
+    collections=DataBlocks(Collection),
+)
+
+context = _types.SimpleNamespace(scene=_types.SimpleNamespace(collection=Collection('Scene Collection')))
+
+types = _types.SimpleNamespace(
+    MeshPolygon=_types.SimpleNamespace(bl_rna=_types.SimpleNamespace(properties={
+        'loop_start': _types.SimpleNamespace(is_readonly=False),
+        'loop_total': _types.SimpleNamespace(is_readonly=False),
+    }))
+)
+
+app = _types.SimpleNamespace(version=(0, 0, 0), background=True)
+
+def install(filepath=''):
+    # Registers this module as bpy unless the real one is already loaded
+    data.filepath = filepath
+    return sys.modules.setdefault('bpy', sys.modules[__name__])
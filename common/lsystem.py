@@ -0,0 +1,686 @@
+import math
+import random
+from collections import OrderedDict
+from functools import lru_cache
+
+import bpy
+import numpy as np
+
+from common.mesh import merge_blocks, write_mesh
+from common.vector import Vector3
+
+# The L-system engine shared by the grammar scripts in lsystems/. A script
+# keeps only its rules and a Turtle subclass setting the turning angle delta
+# and which symbols rotate and draw.
+
+class ProductionRule(object):
+    def __init__(self, input, outputs):
+        self.input = input
+        self.outputs = outputs
+        self.n_outputs = len(outputs)
+
+    def is_deterministic(self):
+        return self.n_outputs == 1
+
+    def choose(self, r=None):
+        # r is a uniform draw in [0, 1); the global generator is used if omitted
+        if r is None:
+            r = random.random()
+        return self.outputs[(int)(self.n_outputs * r)]
+
+    def apply(self, input_string):
+        return "".join([self.choose() if letter == self.input else letter for letter in input_string])
+
+class LRUCache(object):
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+def is_balanced(word):
+    depth = 0
+    for c in word:
+        if c == '[':
+            depth += 1
+        elif c == ']':
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+class LSystem(object):
+    def __init__(self, production_rules, axiom, cache_size=256, seed=None):
+        self.production_rules = production_rules
+        self.current_iteration = axiom
+        self.n_iterations = 0
+
+        # Within a generation the rules are applied one after another, each
+        # to the whole word the ones before it left. The same word comes out
+        # of a single pass that rewrites every symbol with its first rule
+        # and then the output with only the rules after that one.
+        # next_rules[i] maps each symbol to the index of its first rule at
+        # or after i, and rules holds every symbol that has one.
+        self.next_rules = [{} for i in range(len(production_rules) + 1)]
+        for i in reversed(range(len(production_rules))):
+            self.next_rules[i] = dict(self.next_rules[i + 1])
+            self.next_rules[i][production_rules[i].input] = i
+        self.rules = self.next_rules[0]
+
+        # The output of one generation of a symbol from rule i on, for every
+        # (symbol, i) whose rules along the way are all deterministic
+        self.fixed_outputs = {}
+        for start in reversed(range(len(production_rules))):
+            for symbol, i in self.next_rules[start].items():
+                if production_rules[i].is_deterministic():
+                    parts = [self.fixed_outputs.get((c, i + 1), None if c in self.next_rules[i + 1] else c) for c in production_rules[i].outputs[0]]
+                    if None not in parts:
+                        self.fixed_outputs[(symbol, start)] = "".join(parts)
+
+        # Every output of every rule with its symbols already taken through
+        # the rules after it: a string when that is fixed, and otherwise a
+        # list of fixed strings and the (symbol, rule index) pairs that still
+        # need a choice. A stochastic symbol then costs one draw and a lookup.
+        self.templates = []
+        for i, production in enumerate(production_rules):
+            templates = []
+            for output in production.outputs:
+                parts = [""]
+                for c in output:
+                    fixed = self.fixed_outputs.get((c, i + 1), None if c in self.next_rules[i + 1] else c)
+                    if fixed is None:
+                        parts += [(c, i + 1), ""]
+                    else:
+                        parts[-1] += fixed
+                templates.append(parts[0] if len(parts) == 1 else [part for part in parts if part != ""])
+            self.templates.append(templates)
+
+        # Purely deterministic grammars can be rewritten by str.translate
+        self.translation = None
+        if all((symbol, 0) in self.fixed_outputs for symbol in self.rules):
+            self.translation = str.maketrans({symbol: self.fixed_outputs[(symbol, 0)] for symbol in self.rules})
+
+        # A symbol is deterministic when a generation of it has a single,
+        # bracket-balanced output and every rewritable symbol in that output
+        # is deterministic too; its whole derivation is then fixed for a
+        # given depth
+        self.deterministic_symbols = {
+            symbol for symbol in self.rules
+            if (symbol, 0) in self.fixed_outputs and is_balanced(self.fixed_outputs[(symbol, 0)])
+        }
+        changed = True
+        while changed:
+            changed = False
+            for symbol in list(self.deterministic_symbols):
+                output = self.fixed_outputs[(symbol, 0)]
+                if any(c in self.rules and c not in self.deterministic_symbols for c in output):
+                    self.deterministic_symbols.remove(symbol)
+                    changed = True
+
+        self.expansions = LRUCache(cache_size)
+
+        # Each L-system draws its stochastic choices from its own generator,
+        # so the same seed always derives the same words
+        self.seed = seed
+        self.random = random.Random(seed).random
+
+    def choose(self, symbol, start=0):
+        # One generation of symbol through the rules from index start on
+        fixed = self.fixed_outputs.get((symbol, start))
+        if fixed is not None:
+            return fixed
+
+        i = self.next_rules[start].get(symbol)
+        if i is None:
+            return symbol
+
+        templates = self.templates[i]
+        template = templates[int(len(templates) * self.random())]
+        if isinstance(template, str):
+            return template
+        return "".join([part if isinstance(part, str) else self.choose(*part) for part in template])
+
+    def is_deterministic(self, symbol):
+        return symbol in self.deterministic_symbols
+
+    def expand(self, symbol, depth):
+        # The word derived from a single symbol, depth generations deep
+        rules = self.rules
+        if depth == 0 or symbol not in rules:
+            return symbol
+
+        if not self.is_deterministic(symbol):
+            return "".join([self.expand(c, depth - 1) if c in rules else c for c in self.choose(symbol)])
+
+        key = (symbol, depth)
+        word = self.expansions.get(key)
+        if word is None:
+            word = "".join([self.expand(c, depth - 1) if c in rules else c for c in self.choose(symbol)])
+            self.expansions.put(key, word)
+        return word
+
+    def iterate(self, n):
+        # Derives the current word n generations deep. Stochastic symbols
+        # are expanded depth-first, drawing their choices in the same order
+        # as generate and Turtle.process_lsystem, so a seed derives the same
+        # word whichever of them is used
+        if self.translation is not None:
+            for i in range(n):
+                self.current_iteration = self.current_iteration.translate(self.translation)
+        else:
+            rules = self.rules
+            self.current_iteration = "".join([self.expand(c, n) if c in rules else c for c in self.current_iteration])
+        self.n_iterations += n
+
+        return self.current_iteration
+
+    def generate(self, n):
+        # Expands the current word n generations deep, depth-first, yielding
+        # one symbol at a time; only the rule outputs along the current
+        # branch of the derivation are held in memory
+        rules = self.rules
+        stack = [(iter(self.current_iteration), n)]
+
+        while stack:
+            symbols, depth = stack[-1]
+            for c in symbols:
+                if depth > 0 and c in rules:
+                    stack.append((iter(self.choose(c)), depth - 1))
+                    break
+                yield c
+            else:
+                stack.pop()
+
+    def forest(self, n, seeds):
+        # Derives the current word n generations deep once per seed, the
+        # same word generate or Turtle.process_lsystem draws with that seed
+        words = []
+        for seed in seeds:
+            variant = LSystem(self.production_rules, self.current_iteration, self.expansions.maxsize, seed)
+            words.append(variant.iterate(n))
+        return words
+
+@lru_cache(maxsize=None)
+def unit_circle(resolution):
+    theta = 2 * np.pi * np.arange(resolution) / resolution
+    return np.cos(theta), np.sin(theta)
+
+@lru_cache(maxsize=None)
+def cylinder_topology(resolution):
+    # Ring i contributes the end vertex 2i and the start vertex 2i + 1
+    i = np.arange(resolution)
+    bottom_v = 2 * i
+    top_v = 2 * i + 1
+    next_bottom_v = (2 * i + 2) % (2 * resolution)
+    next_top_v = (2 * i + 3) % (2 * resolution)
+
+    edges = np.stack([bottom_v, top_v, bottom_v, next_bottom_v, top_v, next_top_v], axis=1).reshape(-1, 2)
+    faces = np.stack([bottom_v, next_bottom_v, next_top_v, top_v], axis=1)
+    return edges, faces
+
+def generate_cylinders(segments, resolution):
+    # segments is an (S, 13) array of start, end, normal, binormal and radius
+    starts = segments[:, 0:3]
+    ends = segments[:, 3:6]
+    normals = segments[:, 6:9]
+    binormals = segments[:, 9:12]
+    radii = segments[:, 12]
+
+    cos, sin = unit_circle(resolution)
+    disp = cos[None, :, None] * normals[:, None, :] + sin[None, :, None] * binormals[:, None, :]
+    disp *= radii[:, None, None]
+
+    vertices = np.empty((len(segments), resolution, 2, 3))
+    vertices[:, :, 0] = ends[:, None, :] + disp
+    vertices[:, :, 1] = starts[:, None, :] + disp
+
+    ring_edges, ring_faces = cylinder_topology(resolution)
+    offsets = (2 * resolution * np.arange(len(segments)))[:, None, None]
+    edges = ring_edges[None] + offsets
+    faces = ring_faces[None] + offsets
+
+    return vertices.reshape(-1, 3), edges.reshape(-1, 2), faces.reshape(-1, 4)
+
+class MeshBuilder(object):
+    def __init__(self, instancing=False):
+        # With instancing, cylinders and other prototype geometry are emitted
+        # once per prototype plus a transform per copy instead of being baked
+        self.instancing = instancing
+        self.blocks = []
+        self.cylinders = {}
+        self.prototypes = {}
+        self.instances = {}
+
+    def add(self, vertices, edges, faces):
+        # Geometry is kept in blocks with their own indices, which build
+        # offsets and joins once
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+        faces = np.asarray(faces, dtype=int)
+        self.blocks.append((vertices, edges, faces.reshape(len(faces), -1) if len(faces) else faces.reshape(0, 3)))
+
+    def add_transformed(self, other, frame):
+        # Adds a packed builder whose geometry is in the local coordinates of
+        # frame, whose rows are the location, tangent, normal and binormal
+        location = frame[0]
+        orientation = frame[1:]
+
+        for resolution, (segments,) in other.cylinders.items():
+            placed = np.empty_like(segments)
+            placed[:, 0:3] = location + segments[:, 0:3] @ orientation
+            placed[:, 3:6] = location + segments[:, 3:6] @ orientation
+            placed[:, 6:9] = segments[:, 6:9] @ orientation
+            placed[:, 9:12] = segments[:, 9:12] @ orientation
+            placed[:, 12] = segments[:, 12]
+            self.cylinders.setdefault(resolution, []).append(placed)
+
+        self.prototypes.update(other.prototypes)
+        for name, (transforms,) in other.instances.items():
+            placed = np.empty_like(transforms)
+            placed[:, 0:9] = (transforms[:, 0:9].reshape(-1, 3, 3) @ orientation).reshape(-1, 9)
+            placed[:, 9:12] = location + transforms[:, 9:12] @ orientation
+            self.instances.setdefault(name, []).append(placed)
+
+        for vertices, edges, faces in other.blocks:
+            self.blocks.append((location + vertices @ orientation, edges, faces))
+
+    def pack(self):
+        # Stacks the recorded geometry into arrays so it can be placed
+        # repeatedly with add_transformed
+        self.cylinders = {resolution: [np.vstack(segments)] for resolution, segments in self.cylinders.items()}
+        self.instances = {name: [np.vstack(transforms)] for name, transforms in self.instances.items()}
+        return self
+
+    def add_cylinder(self, start, end, normal, binormal, radius, resolution):
+        # Cylinders are only recorded here and generated together in build
+        segment = np.concatenate([start, end, normal, binormal, [radius]])
+        self.cylinders.setdefault(resolution, []).append(segment)
+
+    def add_instance(self, name, prototype, location, axes):
+        # Places a copy of prototype, a (vertices, edges, faces) tuple in local
+        # coordinates, with its x, y and z axes mapped to the rows of axes
+        self.prototypes.setdefault(name, prototype)
+        transform = np.concatenate([np.ravel(axes), location])
+        self.instances.setdefault(name, []).append(transform)
+
+    def clear(self):
+        self.blocks = []
+        self.cylinders = {}
+        self.prototypes = {}
+        self.instances = {}
+
+    def build(self):
+        for resolution, segments in self.cylinders.items():
+            segments = np.vstack(segments)
+
+            if self.instancing:
+                name = 'cylinder_{0}'.format(resolution)
+                self.prototypes[name] = cylinder_prototype(resolution)
+                self.instances.setdefault(name, []).append(cylinder_transforms(segments))
+            else:
+                self.add(*generate_cylinders(segments, resolution))
+
+        for name, transforms in self.instances.items():
+            transforms = np.vstack(transforms)
+
+            if self.instancing:
+                generate_instances(name, self.prototypes[name], transforms)
+            else:
+                self.add(*bake_instances(self.prototypes[name], transforms))
+
+        if self.blocks:
+            generate_mesh(*merge_blocks(self.blocks))
+        self.clear()
+
+@lru_cache(maxsize=None)
+def cylinder_prototype(resolution):
+    # A unit cylinder from the origin to z = 1 with its rings in the xy plane
+    segment = np.array([[0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 1, 0, 1]], dtype=float)
+    return generate_cylinders(segment, resolution)
+
+def cylinder_transforms(segments):
+    # Maps the unit cylinder's x, y and z axes onto radius * normal,
+    # radius * binormal and end - start, with its origin at start
+    radii = segments[:, 12:13]
+    transforms = np.empty((len(segments), 12))
+    transforms[:, 0:3] = radii * segments[:, 6:9]
+    transforms[:, 3:6] = radii * segments[:, 9:12]
+    transforms[:, 6:9] = segments[:, 3:6] - segments[:, 0:3]
+    transforms[:, 9:12] = segments[:, 0:3]
+    return transforms
+
+def bake_instances(prototype, transforms):
+    vertices, edges, faces = (np.asarray(a) for a in prototype)
+    axes = transforms[:, 0:9].reshape(-1, 3, 3)
+    locations = transforms[:, 9:12]
+
+    placed = locations[:, None, :] + vertices[None] @ axes
+    offsets = (len(vertices) * np.arange(len(transforms)))[:, None, None]
+    edges = edges[None] + offsets
+    faces = faces[None] + offsets
+
+    return placed.reshape(-1, 3), edges.reshape(-1, edges.shape[-1]), faces.reshape(-1, faces.shape[-1])
+
+def instance_rotations(transforms):
+    # Splits each transform's orthogonal axes into a scale and an XYZ Euler
+    # rotation, the form Blender's Instance on Points node takes
+    axes = transforms[:, 0:9].reshape(-1, 3, 3)
+    scales = np.linalg.norm(axes, axis=2)
+    rotation = np.transpose(axes / scales[:, :, None], (0, 2, 1))
+
+    sy = np.hypot(rotation[:, 0, 0], rotation[:, 1, 0])
+    singular = sy < 1e-6
+
+    euler = np.empty((len(transforms), 3))
+    euler[:, 0] = np.where(singular, np.arctan2(-rotation[:, 1, 2], rotation[:, 1, 1]), np.arctan2(rotation[:, 2, 1], rotation[:, 2, 2]))
+    euler[:, 1] = np.arctan2(-rotation[:, 2, 0], sy)
+    euler[:, 2] = np.where(singular, 0, np.arctan2(rotation[:, 1, 0], rotation[:, 0, 0]))
+    return euler, scales
+
+# Opcodes of a compiled turtle program
+PUSH, POP, ROTATE, DRAW = range(4)
+
+# Location at the origin with the tangent, normal and binormal on the axes
+IDENTITY_FRAME = np.vstack([np.zeros(3), np.identity(3)])
+
+@lru_cache(maxsize=None)
+def frame_rotation(axis, delta):
+    # Rotation about one row of the frame (0 tangent, 1 normal, 2 binormal),
+    # acting on the stacked tangent, normal and binormal rows
+    i, j = [(1, 2), (0, 2), (0, 1)][axis]
+    c = math.cos(delta)
+    s = math.sin(delta)
+
+    rotation = np.identity(3)
+    rotation[i, i] = c
+    rotation[i, j] = s
+    rotation[j, i] = -s
+    rotation[j, j] = c
+    return rotation
+
+class Turtle(object):
+    delta = math.pi * 0.5
+
+    # Rotation symbols map to (frame axis, sign of delta)
+    rotation_symbols = {
+        '+': (0, 1),
+        '-': (0, -1),
+        '&': (1, 1),
+        '^': (1, -1),
+        '\\': (2, 1),
+        '/': (2, -1)
+    }
+
+    # Draw symbols map to the name of the method drawing them
+    draw_methods = {
+        'F': 'move_forward'
+    }
+
+    def __init__(self, location: Vector3, tangent: Vector3, normal: Vector3, max_depth=64, cache_size=256, instancing=False):
+        # The frame rows are the location, tangent, normal and binormal
+        self.frame = np.array([
+            location.to_list(),
+            tangent.normalize().to_list(),
+            normal.normalize().to_list(),
+            (tangent ** normal).normalize().to_list()
+        ], dtype=float)
+        self.orientation = self.frame[1:]
+        self.scratch = np.empty((3, 3))
+
+        self.branch_length = 1
+
+        self.stack = np.empty((max_depth, 4, 3))
+        self.depth = 0
+        self.mesh = MeshBuilder(instancing)
+
+        self.draw_symbols = {c: getattr(self, name) for c, name in self.draw_methods.items()}
+        self.folded_rotations = {}
+        self.geometry_cache = LRUCache(cache_size)
+
+    def compile(self, word):
+        # Translates a word into (opcode, argument) pairs. Runs of consecutive
+        # rotations are folded into one precomputed matrix, and symbols the
+        # turtle does not draw are dropped. Works lazily on streamed words.
+        run = ""
+        for c in word:
+            if c in self.rotation_symbols:
+                run += c
+                continue
+
+            if run:
+                yield ROTATE, self.fold_rotations(run)
+                run = ""
+
+            if c == '[':
+                yield PUSH, None
+            elif c == ']':
+                yield POP, None
+            elif c in self.draw_symbols:
+                yield DRAW, self.draw_symbols[c]
+
+        if run:
+            yield ROTATE, self.fold_rotations(run)
+
+    def fold_rotations(self, run):
+        key = (run, self.delta)
+        if key not in self.folded_rotations:
+            rotation = np.identity(3)
+            for c in run:
+                axis, sign = self.rotation_symbols[c]
+                rotation = frame_rotation(axis, sign * self.delta) @ rotation
+            self.folded_rotations[key] = rotation
+        return self.folded_rotations[key]
+
+    def execute(self, program):
+        rotate = self.rotate
+        push_stack = self.push_stack
+        pop_stack = self.pop_stack
+        branch_length = self.branch_length
+
+        for opcode, argument in program:
+            if opcode == ROTATE:
+                rotate(argument)
+            elif opcode == DRAW:
+                argument(branch_length)
+            elif opcode == PUSH:
+                push_stack()
+            else:
+                pop_stack()
+
+        self.mesh.build()
+
+    def process_word(self, word):
+        self.execute(self.compile(word))
+
+    def process_lsystem(self, lsystem, n):
+        # Draws the current word of lsystem derived n generations deep,
+        # reusing the geometry of deterministic subtrees
+        for c in lsystem.current_iteration:
+            self.expand(lsystem, c, n)
+
+        self.mesh.build()
+
+    def expand(self, lsystem, symbol, depth):
+        if depth == 0 or symbol not in lsystem.rules:
+            self.execute_symbol(symbol)
+        elif lsystem.is_deterministic(symbol):
+            self.place(self.local_geometry(lsystem, symbol, depth))
+        else:
+            for c in lsystem.choose(symbol):
+                self.expand(lsystem, c, depth - 1)
+
+    def execute_symbol(self, c):
+        if c in self.rotation_symbols:
+            self.rotate(self.fold_rotations(c))
+        elif c == '[':
+            self.push_stack()
+        elif c == ']':
+            self.pop_stack()
+        elif c in self.draw_symbols:
+            self.draw_symbols[c](self.branch_length)
+
+    def local_geometry(self, lsystem, symbol, depth):
+        # The geometry a deterministic subtree draws starting from the
+        # identity frame, and the frame it leaves the turtle in
+        key = (lsystem, symbol, depth, self.delta, self.branch_length)
+        geometry = self.geometry_cache.get(key)
+
+        if geometry is None:
+            frame = self.frame.copy()
+            mesh = self.mesh
+
+            self.frame[:] = IDENTITY_FRAME
+            self.mesh = MeshBuilder(mesh.instancing)
+            for c in lsystem.choose(symbol):
+                self.expand(lsystem, c, depth - 1)
+            geometry = (self.mesh.pack(), self.frame.copy())
+
+            self.frame[:] = frame
+            self.mesh = mesh
+            self.geometry_cache.put(key, geometry)
+
+        return geometry
+
+    def place(self, geometry):
+        mesh, local_frame = geometry
+        self.mesh.add_transformed(mesh, self.frame)
+
+        location = self.frame[0] + local_frame[0] @ self.orientation
+        orientation = local_frame[1:] @ self.orientation
+        self.frame[0] = location
+        self.orientation[:] = orientation
+
+    def move_forward(self, length):
+        location = self.frame[0]
+        old_location = location.copy()
+        location += length * self.frame[1]
+
+        self.draw_branch(old_location, location, self.frame[2], self.frame[3])
+
+    def draw_branch(self, start, end, normal, binormal):
+        radius = 0.1
+        resolution = 10
+
+        self.mesh.add_cylinder(start, end, normal, binormal, radius, resolution)
+
+    @property
+    def location(self):
+        return Vector3(*self.frame[0].tolist())
+
+    @property
+    def tangent(self):
+        return Vector3(*self.frame[1].tolist())
+
+    @property
+    def normal(self):
+        return Vector3(*self.frame[2].tolist())
+
+    @property
+    def binormal(self):
+        return Vector3(*self.frame[3].tolist())
+
+    def push_stack(self):
+        if self.depth == len(self.stack):
+            self.stack = np.concatenate([self.stack, np.empty_like(self.stack)])
+
+        self.stack[self.depth] = self.frame
+        self.depth += 1
+
+    def pop_stack(self):
+        # An unbalanced ] would otherwise restore an unset slot
+        if self.depth == 0:
+            raise IndexError("pop from empty turtle stack")
+        self.depth -= 1
+        self.frame[:] = self.stack[self.depth]
+
+    def rotate(self, rotation):
+        np.dot(rotation, self.orientation, out=self.scratch)
+        self.orientation[:] = self.scratch
+
+    def rotate_tangent(self, delta):
+        self.rotate(frame_rotation(0, delta))
+
+    def rotate_normal(self, delta):
+        self.rotate(frame_rotation(1, delta))
+
+    def rotate_binormal(self, delta):
+        self.rotate(frame_rotation(2, delta))
+
+def generate_mesh(vertices, edges, faces):
+    new_mesh = bpy.data.meshes.new('new_mesh')
+    write_mesh(new_mesh, vertices, edges, faces)
+
+    new_object = bpy.data.objects.new('new_object', new_mesh)
+
+    new_collection = bpy.data.collections.new('new_collection')
+    bpy.context.scene.collection.children.link(new_collection)
+
+    new_collection.objects.link(new_object)
+
+    return new_object
+
+def generate_instances(name, prototype, transforms):
+    vertices, edges, faces = prototype
+    prototype_object = generate_mesh(vertices, edges, faces)
+    prototype_object.name = name
+    prototype_object.hide_render = True
+    prototype_object.hide_set(True)
+
+    # One point per instance, carrying its rotation and scale as attributes
+    euler, scales = instance_rotations(transforms)
+    points_mesh = bpy.data.meshes.new(name + '_points')
+    points_mesh.vertices.add(len(transforms))
+    points_mesh.vertices.foreach_set('co', transforms[:, 9:12].ravel())
+    for attribute, values in (('rotation', euler), ('scale', scales)):
+        points_mesh.attributes.new(name=attribute, type='FLOAT_VECTOR', domain='POINT')
+        points_mesh.attributes[attribute].data.foreach_set('vector', values.ravel())
+    points_mesh.update()
+
+    points_object = bpy.data.objects.new(name + '_instances', points_mesh)
+    prototype_object.users_collection[0].objects.link(points_object)
+
+    modifier = points_object.modifiers.new(name='Instances', type='NODES')
+    modifier.node_group = instancing_node_group(name, prototype_object)
+
+def instancing_node_group(name, prototype_object):
+    tree = bpy.data.node_groups.new(name + '_instancing', 'GeometryNodeTree')
+    if hasattr(tree, 'interface'):
+        tree.interface.new_socket(name='Geometry', in_out='INPUT', socket_type='NodeSocketGeometry')
+        tree.interface.new_socket(name='Geometry', in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    else:
+        tree.inputs.new('NodeSocketGeometry', 'Geometry')
+        tree.outputs.new('NodeSocketGeometry', 'Geometry')
+
+    nodes = tree.nodes
+    links = tree.links
+
+    input_node = nodes.new('NodeGroupInput')
+    output_node = nodes.new('NodeGroupOutput')
+
+    object_info = nodes.new('GeometryNodeObjectInfo')
+    object_info.inputs['Object'].default_value = prototype_object
+
+    instance_node = nodes.new('GeometryNodeInstanceOnPoints')
+
+    links.new(input_node.outputs[0], instance_node.inputs['Points'])
+    links.new(object_info.outputs['Geometry'], instance_node.inputs['Instance'])
+
+    for attribute in ('rotation', 'scale'):
+        attribute_node = nodes.new('GeometryNodeInputNamedAttribute')
+        attribute_node.data_type = 'FLOAT_VECTOR'
+        attribute_node.inputs['Name'].default_value = attribute
+        links.new(attribute_node.outputs['Attribute'], instance_node.inputs[attribute.capitalize()])
+
+    links.new(instance_node.outputs['Instances'], output_node.inputs[0])
+
+    return tree
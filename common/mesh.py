@@ -0,0 +1,75 @@
+from itertools import chain
+
+import bpy
+import numpy as np
+
+def face_loops(faces):
+    # Flattens faces into the per-loop vertex indices and the per-polygon
+    # loop starts and totals Blender stores. faces is a 2D array of equally
+    # sized faces, a list of such arrays, or a plain list of index lists.
+    if isinstance(faces, np.ndarray):
+        blocks = [faces]
+    elif len(faces) and all(isinstance(block, np.ndarray) and block.ndim == 2 for block in faces):
+        blocks = faces
+    else:
+        blocks = [faces]
+
+    loop_vertices = []
+    loop_totals = []
+    for block in blocks:
+        if isinstance(block, np.ndarray):
+            loop_vertices.append(block.ravel())
+            loop_totals.append(np.full(len(block), block.shape[1] if block.ndim == 2 else 0))
+        else:
+            loop_vertices.append(np.fromiter(chain.from_iterable(block), dtype=np.int32))
+            loop_totals.append(np.array([len(face) for face in block], dtype=np.int32))
+
+    loop_vertices = np.concatenate(loop_vertices).astype(np.int32) if loop_vertices else np.empty(0, dtype=np.int32)
+    loop_totals = np.concatenate(loop_totals).astype(np.int32) if loop_totals else np.empty(0, dtype=np.int32)
+    loop_starts = (np.cumsum(loop_totals) - loop_totals).astype(np.int32)
+
+    return loop_vertices, loop_starts, loop_totals
+
+def merge_blocks(blocks):
+    # Joins (vertices, edges, faces) blocks with block-local indices into one
+    # vertex array, one edge array and a list of face arrays
+    vertices = []
+    edges = []
+    faces = []
+    offset = 0
+    for block_vertices, block_edges, block_faces in blocks:
+        vertices.append(block_vertices)
+        edges.append(block_edges + offset)
+        faces.append(block_faces + offset)
+        offset += len(block_vertices)
+
+    return np.concatenate(vertices), np.concatenate(edges), faces
+
+def write_mesh(mesh, vertices, edges, faces):
+    # Fills an empty bpy mesh straight from flat buffers with foreach_set,
+    # the same steps Mesh.from_pydata takes but without building Python
+    # sequences out of every vertex and face first
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+    edges = np.ascontiguousarray(edges, dtype=np.int32).reshape(-1, 2)
+    loop_vertices, loop_starts, loop_totals = face_loops(faces)
+
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set('co', vertices.ravel())
+
+    mesh.edges.add(len(edges))
+    mesh.edges.foreach_set('vertices', edges.ravel())
+
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set('vertex_index', loop_vertices)
+
+    mesh.polygons.add(len(loop_starts))
+    mesh.polygons.foreach_set('loop_start', loop_starts)
+    # Newer versions of Blender derive the totals from the starts
+    if not bpy.types.MeshPolygon.bl_rna.properties['loop_total'].is_readonly:
+        mesh.polygons.foreach_set('loop_total', loop_totals)
+
+    # calc_edges is what links the polygon corners to their edges, adding
+    # any the faces need that aren't in edges, so it runs whenever there
+    # are faces even though the edges are given
+    mesh.update(calc_edges=len(loop_starts) > 0, calc_edges_loose=len(edges) > 0)
+    return mesh
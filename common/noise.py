@@ -0,0 +1,321 @@
+# Licensed under ISC Copyright 2018 github@evee
+# Used with modifications to the "bias functionality
+# so that the original Perlin noise is unmodified
+from itertools import product
+import math
+import random
+
+import numpy as np
+
+
+def s_curve(t):
+    return t * t * (3. - 2. * t)
+
+def lerp(t, a, b):
+    return a + t * (b - a)
+
+class PerlinNoiseFactory(object):
+    """Callable that produces Perlin noise for an arbitrary point in an
+    arbitrary number of dimensions.  The underlying grid is aligned with the
+    integers.
+    There is no limit to the coordinates used; new gradients are generated on
+    the fly as necessary, unless a fixed-size gradient table is asked for.
+    """
+
+    def __init__(self, dimension, octaves=1, tile=(), table_size=None, seed=None):
+        """Create a new Perlin noise factory in the given number of dimensions,
+        which should be an integer and at least 1.
+        More octaves create a foggier and more-detailed noise pattern.  More
+        than 4 octaves is rather excessive.
+        ``tile`` can be used to make a seamlessly tiling pattern.  For example:
+            pnf = PerlinNoiseFactory(2, tile=(0, 3))
+        This will produce noise that tiles every 3 units vertically, but never
+        tiles horizontally.
+        ``table_size`` switches from one lazily generated gradient per grid
+        point to a fixed table of that many gradients, a power of two, picked
+        by hashing the grid point through a permutation table as in classic
+        Perlin noise.  Memory then stays constant however much of the noise
+        is sampled, and the pattern repeats every ``table_size`` units.
+        ``seed`` makes the gradients reproducible; without one they come from
+        the global ``random`` state.
+        """
+        self.dimension = dimension
+        self.octaves = octaves
+        self.tile = tile + (0,) * dimension
+
+        # For n dimensions, the range of Perlin noise is ±sqrt(n)/2; multiply
+        # by this to scale to ±1
+        self.scale_factor = 2 * dimension ** -0.5
+
+        self.random = random if seed is None else random.Random(seed)
+
+        self.gradient = {}
+
+        self.table_size = table_size
+        if table_size is not None:
+            if table_size < 1 or table_size & (table_size - 1):
+                raise ValueError("Expected a power of two table size, got {}".format(
+                    table_size))
+
+            permutation = list(range(table_size))
+            self.random.shuffle(permutation)
+            gradients = [self._generate_gradient() for _ in range(table_size)]
+
+            # Lists for the scalar path, contiguous arrays for noise_grid
+            self.permutation = permutation
+            self.gradient_table = gradients
+            self.permutation_array = np.array(permutation, dtype=np.int64)
+            self.gradient_array = np.array(gradients, dtype=float)
+
+        # Sorted array copies of self.gradient for noise_grid
+        self._known_keys = self._row_keys(np.empty((0, dimension)))
+        self._known_values = np.empty((0, dimension))
+        self._known_count = 0
+
+    def _generate_gradient(self):
+        # Generate a random unit vector at each grid point -- this is the
+        # "gradient" vector, in that the grid tile slopes towards it
+
+        # 1 dimension is special, since the only unit vector is trivial;
+        # instead, use a slope between -1 and 1
+        if self.dimension == 1:
+            return (self.random.uniform(-1, 1),)
+
+        # Generate a random point on the surface of the unit n-hypersphere;
+        # this is the same as a random unit vector in n dimensions.  Thanks
+        # to: http://mathworld.wolfram.com/SpherePointPicking.html
+        # Pick n normal random variables with stddev 1
+        random_point = [self.random.gauss(0, 1) for _ in range(self.dimension)]
+        # Then scale the result to a unit vector
+        scale = sum(n * n for n in random_point) ** -0.5
+        return tuple(coord * scale for coord in random_point)
+
+    def get_plain_noise(self, *point):
+        """Get plain noise for a single point, without taking into account
+        either octaves or tiling.
+        """
+        if len(point) != self.dimension:
+            raise ValueError("Expected {} values, got {}".format(
+                self.dimension, len(point)))
+
+        # Build a list of the (min, max) bounds in each dimension
+        grid_coords = []
+        for coord in point:
+            min_coord = math.floor(coord)
+            max_coord = min_coord + 1
+            grid_coords.append((min_coord, max_coord))
+
+        # Compute the dot product of each gradient vector and the point's
+        # distance from the corresponding grid point.  This gives you each
+        # gradient's "influence" on the chosen point.
+        dots = []
+        for grid_point in product(*grid_coords):
+            gradient = self._get_gradient(grid_point)
+
+            dot = 0
+            for i in range(self.dimension):
+                dot += gradient[i] * (point[i] - grid_point[i])
+            dots.append(dot)
+
+        # Interpolate all those dot products together.  The interpolation is
+        # done with s_curve to smooth out the slope as you pass from one
+        # grid cell into the next.
+        # Due to the way product() works, dot products are ordered such that
+        # the last dimension alternates: (..., min), (..., max), etc.  So we
+        # can interpolate adjacent pairs to "collapse" that last dimension.  Then
+        # the results will alternate in their second-to-last dimension, and so
+        # forth, until we only have a single value left.
+        dim = self.dimension
+        while len(dots) > 1:
+            dim -= 1
+            s = s_curve(point[dim] - grid_coords[dim][0])
+
+            next_dots = []
+            while dots:
+                next_dots.append(lerp(s, dots.pop(0), dots.pop(0)))
+
+            dots = next_dots
+
+        return dots[0] * self.scale_factor
+
+    def _get_gradient(self, grid_point):
+        if self.table_size is not None:
+            # Fold the coordinates through the permutation table one at a
+            # time, like perm[perm[x] + y] in classic Perlin noise
+            mask = self.table_size - 1
+            index = 0
+            for coord in grid_point:
+                index = self.permutation[(index + coord) & mask]
+            return self.gradient_table[index]
+
+        if grid_point not in self.gradient:
+            self.gradient[grid_point] = self._generate_gradient()
+        return self.gradient[grid_point]
+
+    def _row_keys(self, grid_points):
+        """View each row of an (n, dimension) integer array as one opaque
+        value that can be sorted and searched.
+        """
+        grid_points = np.ascontiguousarray(grid_points, dtype=np.int64)
+        return grid_points.view(np.dtype((np.void, 8 * self.dimension))).ravel()
+
+    def _known_gradients(self):
+        """The gradients generated so far as arrays sorted by grid point,
+        rebuilt whenever the scalar path has added to ``self.gradient``.
+        """
+        if self._known_count != len(self.gradient):
+            grid_points = np.array(list(self.gradient), dtype=np.int64)
+            gradients = np.array(list(self.gradient.values()), dtype=float)
+            keys = self._row_keys(grid_points.reshape(-1, self.dimension))
+            order = np.argsort(keys, kind='stable')
+            self._known_keys = keys[order]
+            self._known_values = gradients.reshape(-1, self.dimension)[order]
+            self._known_count = len(self.gradient)
+        return self._known_keys, self._known_values
+
+    def _gradient_table(self, grid_points):
+        """Look up the gradients of an (n, dimension) array of integer grid
+        points, generating any that are missing in the order the points
+        first appear, exactly as the same sequence of scalar lookups would.
+        """
+        if self.table_size is not None:
+            mask = self.table_size - 1
+            index = np.zeros(len(grid_points), dtype=np.int64)
+            for i in range(self.dimension):
+                index = self.permutation_array[(index + grid_points[:, i]) & mask]
+            return self.gradient_array[index]
+
+        # Sorting single integers is much faster than sorting rows, so the
+        # points are numbered within their bounding box when that fits
+        low = grid_points.min(axis=0)
+        extent = grid_points.max(axis=0) - low + 1
+        if math.prod(extent.tolist()) < 2 ** 63:
+            flat = np.ravel_multi_index(tuple((grid_points - low).T), extent)
+            unique, first, inverse = np.unique(
+                flat, return_index=True, return_inverse=True)
+            unique = np.stack(np.unravel_index(unique, extent), axis=-1) + low
+        else:
+            unique, first, inverse = np.unique(
+                grid_points, axis=0, return_index=True, return_inverse=True)
+
+        keys = self._row_keys(unique)
+        known_keys, known_values = self._known_gradients()
+
+        table = np.empty((len(unique), self.dimension))
+        found = np.zeros(len(unique), dtype=bool)
+        if len(known_keys):
+            index = np.searchsorted(known_keys, keys).clip(max=len(known_keys) - 1)
+            found = known_keys[index] == keys
+            table[found] = known_values[index[found]]
+
+        missing = np.flatnonzero(~found)
+        missing = missing[np.argsort(first[missing], kind='stable')]
+        for i in missing.tolist():
+            gradient = self._generate_gradient()
+            self.gradient[tuple(unique[i].tolist())] = gradient
+            table[i] = gradient
+
+        if len(missing):
+            keys = np.concatenate([known_keys, keys[missing]])
+            values = np.concatenate([known_values, table[missing]])
+            order = np.argsort(keys, kind='stable')
+            self._known_keys = keys[order]
+            self._known_values = values[order]
+            self._known_count = len(self.gradient)
+
+        return table[inverse.reshape(-1)]
+
+    def _plain_noise_grid(self, points):
+        """Plain noise for a (..., dimension) array of points, vectorized
+        over the leading axes.
+        """
+        min_coords = np.floor(points)
+        corners = np.array(list(product((0, 1), repeat=self.dimension)))
+        grid_points = min_coords.astype(np.int64)[..., None, :] + corners
+
+        gradients = self._gradient_table(
+            grid_points.reshape(-1, self.dimension)).reshape(grid_points.shape)
+
+        # Summed one dimension at a time, in the same order as the scalar
+        # path, so the results match it to the last bit
+        distances = points[..., None, :] - grid_points
+        dots = 0
+        for i in range(self.dimension):
+            dots = dots + gradients[..., i] * distances[..., i]
+
+        # Corners are in product() order, so as in get_plain_noise each
+        # pass collapses the last remaining dimension
+        dots = dots.reshape(points.shape[:-1] + (2,) * self.dimension)
+        for dim in reversed(range(self.dimension)):
+            s = s_curve(points[..., dim] - min_coords[..., dim])
+            s = s.reshape(s.shape + (1,) * dim)
+            dots = lerp(s, dots[..., 0], dots[..., 1])
+
+        return dots * self.scale_factor
+
+    def noise_grid(self, points, chunk_size=1 << 15):
+        """Get the value of this Perlin noise function at every point of a
+        (..., dimension) array at once, returning an array of the leading
+        shape.  The values, and the gradients generated along the way, are
+        identical to calling the factory on each point in turn.
+        Points are evaluated ``chunk_size`` at a time to bound the memory
+        used by the intermediate arrays.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.shape[-1:] != (self.dimension,):
+            raise ValueError("Expected points with {} values, got shape {}".format(
+                self.dimension, points.shape))
+
+        flat_points = points.reshape(-1, self.dimension)
+        ret = np.empty(len(flat_points))
+        for start in range(0, len(flat_points), chunk_size):
+            end = start + chunk_size
+            ret[start:end] = self._noise_chunk(flat_points[start:end])
+
+        return ret.reshape(points.shape[:-1])
+
+    def _noise_chunk(self, points):
+        # Every octave's points are looked up together, point by point, so
+        # new gradients come out of the random stream in the same order
+        octave_points = []
+        for o in range(self.octaves):
+            o2 = 1 << o
+            coords = points * o2
+            for i in range(self.dimension):
+                if self.tile[i]:
+                    coords[..., i] %= self.tile[i] * o2
+            octave_points.append(coords)
+
+        noise = self._plain_noise_grid(np.stack(octave_points, axis=-2))
+
+        ret = 0
+        for o in range(self.octaves):
+            ret = ret + noise[..., o] / (1 << o)
+
+        ret /= 2 - 2 ** (1 - self.octaves)
+
+        return ret
+
+    def __call__(self, *point):
+        """Get the value of this Perlin noise function at the given point.  The
+        number of values given should match the number of dimensions.
+        """
+        ret = 0
+        for o in range(self.octaves):
+            o2 = 1 << o
+            new_point = []
+            for i, coord in enumerate(point):
+                coord *= o2
+                if self.tile[i]:
+                    coord %= self.tile[i] * o2
+                new_point.append(coord)
+            ret += self.get_plain_noise(*new_point) / o2
+
+        # Need to scale n back down since adding all those extra octaves has
+        # probably expanded it beyond ±1
+        # 1 octave: ±1
+        # 2 octaves: ±1½
+        # 3 octaves: ±1¾
+        ret /= 2 - 2 ** (1 - self.octaves)
+
+        return ret
\ No newline at end of file
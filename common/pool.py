@@ -0,0 +1,23 @@
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+def process_map(function, items, processes=None):
+    # Yields function(item) for every item in order, computed across a pool
+    # of processes, or in this one when processes is 1. Workers are spawned
+    # rather than forked so they start from a clean interpreter instead of a
+    # copy of Blender, and the running script's path is hidden from them so
+    # they don't try to run it again. function and the items have to be
+    # picklable.
+    if processes == 1:
+        yield from map(function, items)
+        return
+
+    main = sys.modules['__main__']
+    main_file = main.__dict__.pop('__file__', None)
+    try:
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            yield from pool.map(function, items)
+    finally:
+        if main_file is not None:
+            main.__file__ = main_file
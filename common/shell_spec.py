@@ -0,0 +1,250 @@
+import ast
+import hashlib
+import json
+import numbers
+import os
+
+import numpy as np
+
+from common.sweep import build_shell, ease_in, ease_out, exponential, linear, make_circle, make_ring, make_semi_oval, make_square, polynomial, shape_morph, shell, smoothstep
+from common.vector import Vector2, Vector3
+
+# Shells written as plain data instead of Python functions, so they can be
+# saved as JSON, hashed, and have their geometry cached on disk:
+#
+#     {
+#         "start": [20, 0, 0], "tangent": [0, 0, 1], "normal": [1, 0, 0],
+#         "constants": {"l": 1.01},
+#         "coiling_rate": "n * pi / 18",
+#         "displacement": "5 * l ** (n - 300)",
+#         "coiling_radius": "l ** (n - 300)",
+#         "scaling_factor": "l ** (n - 300)",
+#         "shape": {"ring": [1, 20]},
+#         "iterations": 400,
+#         "closed": true
+#     }
+#
+# Rates are numbers or expressions in the iteration n and the constants.
+# Shapes are {"circle" / "ring" / "semi_oval" / "square": [r, n]}, {"points": [[x, y], ...]},
+# {"morph": {"keys": [shape, ...], "stops": [...], "easing": [...]}}, or the
+# name of an entry in the spec's "shapes". A "spine" of [[x, y, z], ...]
+# points bends the axis along it, in which case "start" and "tangent" can be
+# left out. Other keys, like a "name", are ignored when building but still
+# part of the hash.
+
+# Bumped whenever the cached buffers would change for the same spec
+CACHE_VERSION = 3
+
+expression_namespace = {
+    'pi': np.pi, 'e': np.e,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'exp': np.exp, 'log': np.log, 'sqrt': np.sqrt, 'abs': np.abs,
+    'minimum': np.minimum, 'maximum': np.maximum, 'where': np.where,
+}
+
+easings = {'linear': linear, 'smoothstep': smoothstep, 'ease_in': ease_in, 'ease_out': ease_out}
+
+shape_makers = {'circle': make_circle, 'ring': make_ring, 'semi_oval': make_semi_oval, 'square': make_square}
+
+def parse_expression(text):
+    # The syntax tree of a rate expression. Specs are plain files, so only
+    # arithmetic and comparisons of numbers and names and calls to the
+    # functions in expression_namespace are allowed. Anything else, like the
+    # attribute lookups an escape from eval needs, is rejected before the
+    # text is compiled.
+    tree = ast.parse(text, mode='eval')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or not callable(expression_namespace.get(node.func.id)) or node.keywords:
+                raise ValueError("Only calls to {0} are allowed in expression '{1}'".format(', '.join(name for name, value in expression_namespace.items() if callable(value)), text))
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, numbers.Real) or isinstance(node.value, bool):
+                raise ValueError("Only numbers are allowed as constants in expression '{0}'".format(text))
+        elif not isinstance(node, (ast.Expression, ast.Name, ast.BinOp, ast.UnaryOp, ast.Compare, ast.operator, ast.unaryop, ast.cmpop, ast.expr_context)):
+            raise ValueError("Unsupported syntax '{0}' in expression '{1}'".format(type(node).__name__, text))
+    return tree
+
+class expression(object):
+    # A rate function of the iteration n given as text. It is evaluated with
+    # NumPy, so it takes a whole array of iterations at once.
+    def __init__(self, text, constants=None):
+        self.text = text
+        self.constants = dict(constants or {})
+        self.code = compile(parse_expression(text), '<expression>', 'eval')
+
+    def __call__(self, n):
+        namespace = dict(expression_namespace, **self.constants)
+        namespace['n'] = n
+        return eval(self.code, {'__builtins__': {}}, namespace)
+
+    def __getstate__(self):
+        # Code objects can't be pickled, so workers compile the text again
+        return {'text': self.text, 'constants': self.constants}
+
+    def __setstate__(self, state):
+        self.__init__(state['text'], state['constants'])
+
+polynomial_operators = {
+    ast.Add: np.polynomial.polynomial.polyadd,
+    ast.Sub: np.polynomial.polynomial.polysub,
+    ast.Mult: np.polynomial.polynomial.polymul,
+}
+
+def polynomial_coefficients(node, values):
+    # The coefficients of node as a polynomial in n, lowest power first, or
+    # None when it isn't one
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, numbers.Real) and not isinstance(node.value, bool):
+            return np.array([float(node.value)])
+    elif isinstance(node, ast.Name):
+        if node.id == 'n':
+            return np.array([0.0, 1.0])
+        elif isinstance(values.get(node.id), numbers.Real):
+            return np.array([float(values[node.id])])
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        operand = polynomial_coefficients(node.operand, values)
+        if operand is not None:
+            return -operand if isinstance(node.op, ast.USub) else operand
+    elif isinstance(node, ast.BinOp):
+        left = polynomial_coefficients(node.left, values)
+        right = polynomial_coefficients(node.right, values)
+        if left is None or right is None:
+            return None
+        if type(node.op) in polynomial_operators:
+            return polynomial_operators[type(node.op)](left, right)
+        elif isinstance(node.op, ast.Div) and len(right) == 1:
+            return left / right[0]
+        elif isinstance(node.op, ast.Pow) and len(right) == 1:
+            if len(left) == 1:
+                return left ** right[0]
+            elif right[0] >= 0 and right[0] == int(right[0]):
+                return np.polynomial.polynomial.polypow(left, int(right[0]))
+    return None
+
+def exponential_terms(node, values):
+    # (a, l, k) with node equal to a * l ** (n - k), where l is None for
+    # plain constants, or None when node isn't of that form
+    coefficients = polynomial_coefficients(node, values)
+    if coefficients is not None:
+        return (coefficients[0], None, None) if len(coefficients) == 1 else None
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        terms = exponential_terms(node.operand, values)
+        if terms is not None:
+            return (-terms[0],) + terms[1:]
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        base = polynomial_coefficients(node.left, values)
+        exponent = polynomial_coefficients(node.right, values)
+        if base is not None and exponent is not None and len(base) == 1 and len(exponent) == 2 and base[0] > 0:
+            # l ** (s * n + c) is (l ** s) ** (n + c / s)
+            return (1.0, base[0] ** exponent[1], -exponent[0] / exponent[1])
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mult, ast.Div)):
+        left = exponential_terms(node.left, values)
+        right = exponential_terms(node.right, values)
+        if left is None or right is None:
+            return None
+        if isinstance(node.op, ast.Div):
+            return (left[0] / right[0],) + left[1:] if right[1] is None else None
+        elif left[1] is None:
+            return (left[0] * right[0],) + right[1:]
+        elif right[1] is None:
+            return (left[0] * right[0],) + left[1:]
+    return None
+
+def compile_rate(text, constants=None):
+    # Turns the polynomials in n, including linear angles like n * pi / 18,
+    # and the exponentials a * l ** (n - k) into closed forms evaluated with
+    # a handful of array operations, and anything else into an expression
+    values = dict(expression_namespace, **(constants or {}))
+    tree = parse_expression(text).body
+
+    coefficients = polynomial_coefficients(tree, values)
+    if coefficients is not None:
+        return polynomial(coefficients)
+
+    terms = exponential_terms(tree, values)
+    if terms is not None and terms[1] is not None:
+        return exponential(*terms)
+
+    return expression(text, constants)
+
+def load_rate(value, constants):
+    if isinstance(value, str):
+        return compile_rate(value, constants)
+    return value
+
+def load_shape(value, shapes):
+    if isinstance(value, str):
+        return load_shape(shapes[value], shapes)
+
+    (kind, arguments), = value.items()
+    if kind in shape_makers:
+        return shape_makers[kind](*arguments)
+    elif kind == 'points':
+        return [Vector2(x, y) for x, y in arguments]
+    elif kind == 'morph':
+        keys = [load_shape(key, shapes) for key in arguments['keys']]
+        easing = arguments.get('easing', 'linear')
+        if isinstance(easing, str):
+            easing = easings[easing]
+        else:
+            easing = [easings[name] for name in easing]
+        return shape_morph(keys, arguments['stops'], easing)
+    raise ValueError("Unknown shape '{0}'".format(kind))
+
+def load_shell(spec):
+    # The shell a spec describes
+    constants = spec.get('constants', {})
+    spine = spec.get('spine')
+    start = spec.get('start', spine[0] if spine else None)
+    tangent = spec.get('tangent', np.subtract(spine[1], spine[0]).tolist() if spine else None)
+    return shell(
+        Vector3(*start), Vector3(*tangent), Vector3(*spec['normal']),
+        load_rate(spec['coiling_rate'], constants),
+        load_rate(spec['displacement'], constants),
+        load_rate(spec['coiling_radius'], constants),
+        load_rate(spec['scaling_factor'], constants),
+        load_shape(spec['shape'], spec.get('shapes', {})),
+        spec['iterations'],
+        spec.get('closed', False), spec.get('capped', False), spec.get('tolerance'), spine
+    )
+
+def spec_hash(spec):
+    # A digest of the spec that doesn't depend on key order or whitespace
+    text = json.dumps([CACHE_VERSION, spec], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def load_specs(filepath):
+    with open(filepath) as f:
+        return json.load(f)
+
+def save_specs(filepath, specs):
+    with open(filepath, 'w') as f:
+        json.dump(specs, f, indent=4)
+
+def build_spec(spec, cache_dir=None):
+    # build_shell for a spec, loaded from cache_dir when the same spec has
+    # been built before and saved there otherwise
+    if cache_dir is None:
+        return build_shell(load_shell(spec))
+
+    path = os.path.join(cache_dir, spec_hash(spec) + '.npz')
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return cached['vertices'], cached['edges'], cached['faces'], cached['caps']
+
+    vertices, edges, faces, caps = build_shell(load_shell(spec))
+    # Narrowed to what Blender stores so a fresh build and a cached load
+    # hand back the same buffers
+    vertices = vertices.astype(np.float32)
+    edges, faces, caps = (a.astype(np.int32) for a in (edges, faces, caps))
+
+    # Written under a temporary name first so an interrupted build never
+    # leaves a truncated file behind for the next load
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary = path + '.{0}.tmp'.format(os.getpid())
+    with open(temporary, 'wb') as f:
+        np.savez(f, vertices=vertices, edges=edges, faces=faces, caps=caps)
+    os.replace(temporary, path)
+
+    return vertices, edges, faces, caps
@@ -0,0 +1,508 @@
+import math
+
+import numpy as np
+
+from common.pool import process_map
+from common.topology import grid_topology
+from common.vector import Vector2, Vector3
+
+class constant(object):
+    # A rate that is the same on every iteration
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, n):
+        return self.value
+
+def make_lambda_function(input):
+    if type(input) is float or type(input) is int:
+        return constant(input)
+    elif callable(input):
+        return input
+
+def evaluate_array(f, n):
+    # Calls f once on the whole array of iterations when it accepts arrays,
+    # and falls back to one call per iteration when it does not. The array
+    # is passed as floats, since rates like 2 ** n would silently overflow
+    # int64, while the fallback keeps Python's unbounded ints and works for
+    # rates that index with n. Only constants may give a single value for
+    # the whole array; any other function returning one, like random jitter,
+    # is called per iteration instead.
+    if isinstance(f, constant):
+        return np.full(n.shape, f.value, dtype=float)
+    try:
+        values = np.asarray(f(n.astype(float)), dtype=float)
+        if values.shape == n.shape:
+            return values
+    except Exception:
+        pass
+    return np.array([f(i) for i in n.tolist()], dtype=float)
+
+def shape_array(shape):
+    return np.array([v.to_list() for v in shape], dtype=float).reshape(-1, 2)
+
+class polynomial(object):
+    # c[0] + c[1] * n + c[2] * n ** 2 + ... evaluated by Horner's rule, so a
+    # whole array of iterations costs one multiply-add per coefficient
+    def __init__(self, coefficients):
+        coefficients = np.asarray(coefficients, dtype=float)
+        self.coefficients = np.trim_zeros(coefficients, 'b') if np.any(coefficients) else np.zeros(1)
+
+    def __call__(self, n):
+        return np.polynomial.polynomial.polyval(n, self.coefficients)
+
+def linear_angle(step, offset=0):
+    # An angle turning by step every iteration, like n * math.pi / 18
+    return polynomial([offset, step])
+
+class exponential(object):
+    # a * l ** (n - k), the growth most of the shells use
+    def __init__(self, a, l, k):
+        self.a = a
+        self.l = l
+        self.k = k
+
+    def __call__(self, n):
+        return self.a * self.l ** (np.asarray(n, dtype=float) - self.k)
+
+class coiling_axis(object):
+    def __init__(self, start_point: Vector3, tangent: Vector3, normal: Vector3, coiling_rate, displacement, coiling_radius, scaling_factor, generating_shape, iterations: int):        
+        self.start_point = start_point
+
+        self.tangent = tangent.normalize()
+        self.normal = (normal - normal.project(tangent)).normalize()
+        self.binormal = (normal ** tangent).normalize()
+
+        self.displacement = make_lambda_function(displacement)
+        self.coiling_rate = make_lambda_function(coiling_rate)
+        self.coiling_radius = make_lambda_function(coiling_radius)
+        self.scaling_factor = make_lambda_function(scaling_factor)
+
+        self.max_iterations = iterations
+        self.current_iteration = 0
+
+        self.shape = None
+        if type(generating_shape) is list:
+            self.shape = generating_shape
+            self.generating_shape = lambda x : generating_shape
+        elif type(generating_shape) is type(lambda x : None) or isinstance(generating_shape, shape_morph):
+            self.generating_shape = generating_shape
+
+    def get_axis_position(self):
+        current_axis_position = self.displacement(self.current_iteration)
+        return current_axis_position * self.tangent + self.start_point
+
+    def get_normal_vector(self):
+        current_angle = self.coiling_rate(self.current_iteration)
+        return math.cos(current_angle) * self.normal + math.sin(current_angle) * self.binormal
+
+    def get_tangent_vector(self):
+        return self.tangent
+
+    def get_radius(self):
+        return self.coiling_radius(self.current_iteration)
+
+    def get_scaling_factor(self):
+        return self.scaling_factor(self.current_iteration)
+
+    def get_generating_shape(self):
+        return self.generating_shape(self.current_iteration)
+
+    def get_iterations(self):
+        # The iterations the sweep places rings at, in order
+        return np.arange(1, self.max_iterations)
+
+    def get_shape_arrays(self, n):
+        # An (iterations, shape_len, 2) array of the generating shape
+        if self.shape is not None:
+            shape = shape_array(self.shape)
+            return np.broadcast_to(shape, (len(n),) + shape.shape)
+        if isinstance(self.generating_shape, shape_morph):
+            return self.generating_shape.arrays(n)
+        return np.stack([shape_array(self.generating_shape(i)) for i in n.tolist()])
+
+    def get_axis_frames(self, displacements):
+        # Positions, tangents, normals and binormals of the axis at the given
+        # distances along it, one row each
+        tangent = np.array(self.tangent.to_list())
+        shape = (len(displacements), 3)
+
+        positions = np.array(self.start_point.to_list()) + displacements[:, None] * tangent
+        tangents = np.broadcast_to(tangent, shape)
+        normals = np.broadcast_to(self.normal.to_list(), shape)
+        binormals = np.broadcast_to(self.binormal.to_list(), shape)
+
+        return positions, tangents, normals, binormals
+
+    def evaluate(self):
+        # Every ring's axis data at once: positions, tangents, normals, radii,
+        # scaling factors and generating shapes, one row per iteration
+        n = self.get_iterations()
+
+        positions, tangents, normal, binormal = self.get_axis_frames(evaluate_array(self.displacement, n))
+
+        angles = evaluate_array(self.coiling_rate, n)[:, None]
+        normals = np.cos(angles) * normal + np.sin(angles) * binormal
+
+        radii = evaluate_array(self.coiling_radius, n)
+        scales = evaluate_array(self.scaling_factor, n)
+        shapes = self.get_shape_arrays(n)
+
+        return positions, tangents, normals, radii, scales, shapes
+
+    def iterate(self):
+        self.current_iteration += 1
+        return self.current_iteration < self.max_iterations
+
+def quaternion_product(p, q):
+    # Row-wise Hamilton products of (..., 4) arrays stored as (w, x, y, z)
+    pw, pv = p[..., :1], p[..., 1:]
+    qw, qv = q[..., :1], q[..., 1:]
+    w = pw * qw - np.sum(pv * qv, axis=-1, keepdims=True)
+    v = pw * qv + qw * pv + np.cross(pv, qv)
+    return np.concatenate([w, v], axis=-1)
+
+def quaternion_rotate(q, v):
+    # Rotates the rows of v by the unit quaternions in the rows of q
+    w, u = q[..., :1], q[..., 1:]
+    t = 2 * np.cross(u, v)
+    return v + w * t + np.cross(u, t)
+
+def minimal_rotations(a, b):
+    # The shortest-arc rotations taking the unit rows of a to those of b,
+    # which turn a frame without any twist about the tangent
+    q = np.concatenate([1 + np.sum(a * b, axis=-1, keepdims=True), np.cross(a, b)], axis=-1)
+
+    # Half turns have no unique shortest arc, any axis perpendicular to a does
+    opposite = q[:, 0] < 1e-12
+    if np.any(opposite):
+        axis = np.cross(a[opposite], [1.0, 0.0, 0.0])
+        parallel = np.sum(axis * axis, axis=-1) < 1e-12
+        axis[parallel] = np.cross(a[opposite][parallel], [0.0, 1.0, 0.0])
+        q[opposite] = np.concatenate([np.zeros((len(axis), 1)), axis], axis=-1)
+
+    return q / np.sqrt(np.sum(q * q, axis=-1, keepdims=True))
+
+def parallel_transport(tangents, normal):
+    # Rotation-minimizing normals and binormals along unit tangents, starting
+    # from normal at the first one. The rotations between neighbouring
+    # tangents are composed with a log-step prefix scan instead of a loop
+    # over the curve, and every frame is built from the composed rotation
+    # rather than from the previous frame, so errors don't pile up.
+    rotations = np.concatenate([[[1.0, 0.0, 0.0, 0.0]], minimal_rotations(tangents[:-1], tangents[1:])])
+    step = 1
+    while step < len(rotations):
+        rotations[step:] = quaternion_product(rotations[step:], rotations[:-step])
+        rotations /= np.sqrt(np.sum(rotations * rotations, axis=-1, keepdims=True))
+        step *= 2
+
+    return orthonormal_frames(tangents, quaternion_rotate(rotations, np.broadcast_to(normal, tangents.shape)))
+
+def orthonormal_frames(tangents, normals):
+    # Normals made exactly perpendicular to the tangents, and the binormals
+    normals = normals - np.sum(normals * tangents, axis=-1, keepdims=True) * tangents
+    normals /= np.sqrt(np.sum(normals * normals, axis=-1, keepdims=True))
+    return normals, np.cross(normals, tangents)
+
+def sample_spine(f, t0, t1, samples=256):
+    # A polyline spine from a parametric curve f, which maps an array of
+    # parameters to an (len(t), 3) array of points
+    return np.asarray(f(np.linspace(t0, t1, samples)), dtype=float)
+
+class spine_axis(coiling_axis):
+    # A coiling axis that follows a polyline spine of (P, 3) points instead
+    # of a straight line. displacement is the distance along the spine, the
+    # spine carrying on straight past its ends, and normal is turned into
+    # the frame at its start and carried along by parallel transport.
+    def __init__(self, spine, normal: Vector3, coiling_rate, displacement, coiling_radius, scaling_factor, generating_shape, iterations: int):
+        self.spine = np.asarray(spine, dtype=float).reshape(-1, 3)
+
+        segments = np.diff(self.spine, axis=0)
+        lengths = np.sqrt(np.sum(segments * segments, axis=-1))
+        self.segment_tangents = segments / lengths[:, None]
+        self.arc_lengths = np.concatenate([[0.0], np.cumsum(lengths)])
+
+        # Tangents at the spine points are the mean of the segments meeting
+        # there, so they turn smoothly between one segment and the next
+        point_tangents = np.concatenate([self.segment_tangents[:1], self.segment_tangents[:-1] + self.segment_tangents[1:], self.segment_tangents[-1:]])
+        self.point_tangents = point_tangents / np.sqrt(np.sum(point_tangents * point_tangents, axis=-1, keepdims=True))
+
+        super().__init__(Vector3(*self.spine[0].tolist()), Vector3(*self.point_tangents[0].tolist()), normal, coiling_rate, displacement, coiling_radius, scaling_factor, generating_shape, iterations)
+
+        self.point_normals = parallel_transport(self.point_tangents, self.normal.to_list())[0]
+
+    def get_axis_frames(self, displacements):
+        displacements = np.asarray(displacements, dtype=float)
+
+        positions = np.stack([np.interp(displacements, self.arc_lengths, self.spine[:, i]) for i in range(3)], axis=-1)
+        before = displacements < 0
+        after = displacements > self.arc_lengths[-1]
+        positions[before] = self.spine[0] + displacements[before, None] * self.segment_tangents[0]
+        positions[after] = self.spine[-1] + (displacements[after, None] - self.arc_lengths[-1]) * self.segment_tangents[-1]
+
+        tangents = np.stack([np.interp(displacements, self.arc_lengths, self.point_tangents[:, i]) for i in range(3)], axis=-1)
+        tangents /= np.sqrt(np.sum(tangents * tangents, axis=-1, keepdims=True))
+
+        # Each ring turns the frame at the spine point before it the rest of
+        # the way, so the frames don't depend on how far apart the rings are
+        index = np.clip(np.searchsorted(self.arc_lengths, displacements, side='right') - 1, 0, len(self.spine) - 1)
+        rotations = minimal_rotations(self.point_tangents[index], tangents)
+        normals, binormals = orthonormal_frames(tangents, quaternion_rotate(rotations, self.point_normals[index]))
+
+        return positions, tangents, normals, binormals
+
+    def get_frame(self):
+        return [Vector3(*row[0].tolist()) for row in self.get_axis_frames(np.array([self.displacement(self.current_iteration)], dtype=float))]
+
+    def get_axis_position(self):
+        return self.get_frame()[0]
+
+    def get_normal_vector(self):
+        position, tangent, normal, binormal = self.get_frame()
+        current_angle = self.coiling_rate(self.current_iteration)
+        return math.cos(current_angle) * normal + math.sin(current_angle) * binormal
+
+    def get_tangent_vector(self):
+        return self.get_frame()[1]
+
+def make_circle(r, n):
+    center = Vector2(0, 0)
+    theta = 2 * math.pi / n
+    vertices = []
+    for i in range(0, n + 1):
+        r_i = r * Vector2(math.cos(i * theta), math.sin(i * theta))
+        p_i = center + r_i
+        vertices.append(p_i)
+    return vertices
+
+def make_ring(r, n):
+    # make_circle without the point that repeats the first, for closed sweeps
+    # that join the last point of each ring back to the first
+    return make_circle(r, n)[:n]
+
+def make_semi_oval(r, n):
+    center = Vector2(0, 0)
+    theta = math.pi / n
+    vertices = []
+    for i in range(0, n):
+        r_i = r * Vector2(math.cos(i * theta), 2 * math.sin(i * theta))
+        p_i = center + r_i
+        vertices.append(p_i)
+        
+    p = center + r * Vector2(-1, 0)
+    vertices.append(p)
+    return vertices
+
+def make_square(r,n):
+    center = Vector2(0,0)
+    theta = 2 * math.pi / n
+    side_offset = math.pi / 2
+    offset = math.pi / 4
+    vertices = []
+
+    for i in range(0, n):
+        side = int(i * 4 / n)
+        ri = r / math.sqrt(2) / math.cos(i * theta - side * side_offset - offset)
+        pi = center + ri * Vector2(math.cos(i * theta) , math.sin(i * theta))
+        vertices.append(pi)
+    return vertices
+
+def homotopy(start_shape, end_shape, n, N):
+    vertices = []
+    for i in range(len(start_shape)):
+        s = start_shape[i]
+        e = end_shape[i]
+        vertices.append(s + (1.0 * n / N) * (e - s))
+    
+    return vertices
+
+def homotopy_arrays(start_shape, end_shape, n, N):
+    # homotopy for every value in the array n at once, as an
+    # (len(n), shape_len, 2) array
+    start = shape_array(start_shape)
+    end = shape_array(end_shape)
+    t = (np.asarray(n, dtype=float) / N)[:, None, None]
+    return start + t * (end - start)
+
+def linear(t):
+    return t
+
+def smoothstep(t):
+    return t * t * (3 - 2 * t)
+
+def ease_in(t):
+    return t * t
+
+def ease_out(t):
+    return t * (2 - t)
+
+class shape_morph(object):
+    # A generating shape that blends between key shapes placed at the given
+    # iterations, holding the first and last keys outside of them. easing
+    # is one function of t in [0, 1] for every segment or a list with one
+    # per segment, applied to whole arrays of t.
+    def __init__(self, keys, stops, easing=linear):
+        self.keys = np.stack([shape_array(key) for key in keys])
+        self.stops = np.asarray(stops, dtype=float)
+
+        if callable(easing):
+            easing = [easing] * (len(keys) - 1)
+        self.easing = easing
+
+    def arrays(self, n):
+        # The (len(n), shape_len, 2) blended shapes at the iterations n
+        n = np.asarray(n, dtype=float)
+        if len(self.keys) == 1:
+            return np.broadcast_to(self.keys[0], (len(n),) + self.keys[0].shape)
+
+        segment = np.clip(np.searchsorted(self.stops, n, side='right') - 1, 0, len(self.stops) - 2)
+        t = np.clip((n - self.stops[segment]) / (self.stops[segment + 1] - self.stops[segment]), 0, 1)
+
+        for i, ease in enumerate(self.easing):
+            in_segment = segment == i
+            if ease is not linear and np.any(in_segment):
+                t[in_segment] = ease(t[in_segment])
+
+        t = t[:, None, None]
+        return self.keys[segment] + t * (self.keys[segment + 1] - self.keys[segment])
+
+    def __call__(self, n):
+        return [Vector2(x, y) for x, y in self.arrays([n])[0].tolist()]
+
+def sweep_vertices(coiling_axis):
+    # The (iterations, shape_len, 3) grid of sweep vertices in one broadcast
+    positions, tangents, normals, radii, scales, shapes = coiling_axis.evaluate()
+
+    centers = positions + radii[:, None] * normals
+    offsets = shapes[:, :, 0:1] * normals[:, None, :] + shapes[:, :, 1:2] * tangents[:, None, :]
+    return centers[:, None, :] + scales[:, None, None] * offsets
+
+def chord_error(points, start, end):
+    # Largest distance between the slices strictly between start and end
+    # and their linear interpolation from the slices at start and end
+    t = (np.arange(start + 1, end) - start) / (end - start)
+    t = t.reshape((-1,) + (1,) * (points.ndim - 1))
+    interpolated = points[start] + t * (points[end] - points[start])
+    return np.sqrt(np.max(np.sum((points[start + 1:end] - interpolated) ** 2, axis=-1)))
+
+def simplify_axis(grid, axis, tolerance):
+    # Indices of the slices of grid along axis to keep so that every dropped
+    # slice is within tolerance of the interpolation between its kept
+    # neighbours; the first and last slices are always kept
+    points = np.moveaxis(grid, axis, 0)
+    n = len(points)
+
+    kept = [0]
+    start = 0
+    while start < n - 1:
+        end = start + 1
+        while end + 1 < n and chord_error(points, start, end + 1) <= tolerance:
+            end += 1
+        kept.append(end)
+        start = end
+
+    return np.array(kept)
+
+def screen_space_tolerance(distance, pixel_error=1.0, fov=math.radians(39.6), resolution=1920):
+    # The world-space size of pixel_error pixels at distance from a camera
+    # with the given field of view, 39.6 degrees being Blender's default
+    return pixel_error * 2 * distance * math.tan(fov / 2) / resolution
+
+def adaptive_sweep_vertices(coiling_axis, tolerance):
+    # Drops the rings and generating shape points that linear interpolation
+    # reproduces within tolerance, so samples follow how fast the position,
+    # radius and scale actually change
+    grid = sweep_vertices(coiling_axis)
+    rings = simplify_axis(grid, 0, tolerance)
+    points = simplify_axis(grid[rings], 1, tolerance)
+    return grid[rings][:, points]
+
+def decimate_indices(n, step):
+    # Every step-th index up to n, always ending on the last one
+    return np.unique(np.append(np.arange(0, n, step), n - 1))
+
+def decimate_grid(grid, step):
+    # Keeps every step-th ring and generating shape point of the grid
+    rings = decimate_indices(grid.shape[0], step)
+    points = decimate_indices(grid.shape[1], step)
+    return grid[rings][:, points]
+
+def interpolation_error(points, kept):
+    # Largest distance between the slices of points and their linear
+    # interpolation from the kept slices around them
+    index = np.arange(len(points))
+    segment = np.clip(np.searchsorted(kept, index, side='right') - 1, 0, len(kept) - 2)
+    start = kept[segment]
+    end = kept[segment + 1]
+    t = ((index - start) / (end - start)).reshape((-1,) + (1,) * (points.ndim - 1))
+    interpolated = points[start] + t * (points[end] - points[start])
+    return np.sqrt(np.max(np.sum((points - interpolated) ** 2, axis=-1)))
+
+def decimation_error(grid, step):
+    # How far decimate_grid(grid, step) strays from grid, first across the
+    # dropped rings and then across the dropped points of the kept rings
+    rings = decimate_indices(grid.shape[0], step)
+    points = decimate_indices(grid.shape[1], step)
+    if len(rings) < 2 or len(points) < 2:
+        return 0.0
+    return interpolation_error(grid, rings) + interpolation_error(np.moveaxis(grid[rings], 1, 0), points)
+
+def lod_distance(size, pixel_error=1.0, fov=math.radians(39.6), resolution=1920):
+    # The inverse of screen_space_tolerance: how far away a camera has to be
+    # for size to shrink to pixel_error pixels
+    return size * resolution / (pixel_error * 2 * math.tan(fov / 2))
+
+def lod_thresholds(grid, levels, pixel_error=1.0):
+    # (near, far) camera distances each level is shown at. Level k takes
+    # over once its decimation error falls under pixel_error pixels.
+    starts = [0.0]
+    for k in range(1, levels):
+        starts.append(max(starts[-1], float(lod_distance(decimation_error(grid, 2 ** k), pixel_error))))
+    return list(zip(starts, starts[1:] + [math.inf]))
+
+class shell(object):
+    # The inputs of one coiling_axis plus how to mesh it, kept free of bpy so
+    # specs can be sent to worker processes. The rate functions and shape
+    # have to be picklable: numbers, lists of Vector2, shape_morphs or
+    # functions defined at the top level of a module. With a spine the
+    # shell follows it as a spine_axis, and start_point and tangent are
+    # taken from its first point instead.
+    def __init__(self, start_point: Vector3, tangent: Vector3, normal: Vector3, coiling_rate, displacement, coiling_radius, scaling_factor, generating_shape, iterations: int, closed=False, capped=False, tolerance=None, spine=None):
+        self.start_point = start_point
+        self.tangent = tangent
+        self.normal = normal
+
+        self.coiling_rate = coiling_rate
+        self.displacement = displacement
+        self.coiling_radius = coiling_radius
+        self.scaling_factor = scaling_factor
+        self.generating_shape = generating_shape
+        self.iterations = iterations
+
+        self.closed = closed
+        self.capped = capped
+        self.tolerance = tolerance
+        self.spine = spine
+
+    def axis(self):
+        if self.spine is not None:
+            return spine_axis(self.spine, self.normal, self.coiling_rate, self.displacement, self.coiling_radius, self.scaling_factor, self.generating_shape, self.iterations)
+        return coiling_axis(self.start_point, self.tangent, self.normal, self.coiling_rate, self.displacement, self.coiling_radius, self.scaling_factor, self.generating_shape, self.iterations)
+
+def build_shell(spec):
+    # The vertex, edge, face and cap buffers of a shell, ready for write_mesh
+    axis = spec.axis()
+    if spec.tolerance is None:
+        grid = sweep_vertices(axis)
+    else:
+        grid = adaptive_sweep_vertices(axis, spec.tolerance)
+    n_rings, l = grid.shape[0:2]
+
+    edges, faces, caps = grid_topology(n_rings, l, spec.closed, spec.capped)
+
+    return grid.reshape(-1, 3).astype(np.float32), edges, faces, caps
+
+def build_shells(specs, processes=None, build=build_shell):
+    # Yields build(spec) for every spec in order, computed across a pool of
+    # processes
+    yield from process_map(build, specs, processes)
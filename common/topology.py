@@ -0,0 +1,37 @@
+from functools import lru_cache
+
+import numpy as np
+
+@lru_cache(maxsize=None)
+def grid_topology(n_rings, ring_length, closed=False, capped=False):
+    # Edges, quad faces and cap faces of n_rings rings of ring_length vertices
+    # each, where vertex j of ring i has index i * ring_length + j. Every edge
+    # appears once. closed joins the last vertex of a ring back to the first,
+    # and capped closes the first and last rings with an n-gon each.
+    # The arrays are cached, so they are returned read-only.
+    index = np.arange(n_rings * ring_length).reshape(n_rings, ring_length)
+    if closed:
+        next_index = np.roll(index, -1, axis=1)
+    else:
+        next_index = index[:, 1:]
+        index = index[:, :-1]
+
+    ring_edges = np.stack([index, next_index], axis=-1).reshape(-1, 2)
+
+    all_index = np.arange(n_rings * ring_length).reshape(n_rings, ring_length)
+    side_edges = np.stack([all_index[:-1], all_index[1:]], axis=-1).reshape(-1, 2)
+
+    edges = np.concatenate([ring_edges, side_edges])
+
+    faces = np.stack([index[:-1], next_index[:-1], next_index[1:], index[1:]], axis=-1).reshape(-1, 4)
+
+    if capped and n_rings > 0:
+        # The first cap is reversed so both caps face outwards
+        caps = np.stack([all_index[0, ::-1], all_index[-1]])
+    else:
+        caps = np.empty((0, ring_length), dtype=int)
+
+    for array in (edges, faces, caps):
+        array.setflags(write=False)
+
+    return edges, faces, caps
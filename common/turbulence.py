@@ -0,0 +1,96 @@
+from functools import lru_cache, partial
+from itertools import product
+
+import numpy as np
+
+from common.noise import PerlinNoiseFactory
+from common.pool import process_map
+
+@lru_cache(maxsize=None)
+def noise_factory(dimension, octaves=1, table_size=256, seed=0):
+    # One factory per process and setting. The gradients come from a seeded
+    # fixed-size table, so every worker samples exactly the same noise.
+    return PerlinNoiseFactory(dimension, octaves, table_size=table_size, seed=seed)
+
+def clamp_pixelsize(pixelsize):
+    # Keeps the pixel size between 0 and 1, not inclusive, as the shader does
+    return min(max(0.000001, pixelsize), 0.999999)
+
+def turbulence(points, time=0.0, pixelsize=0.2, table_size=256, seed=0):
+    # The turbulence() of turbulence.osl for a (..., d) array of points: the
+    # absolute value of (d + 1)-dimensional noise at the point and time,
+    # summed over every scale from 1 down to the pixel size, halving each
+    # time. Every octave is one noise_grid call over all of the points.
+    points = np.asarray(points, dtype=float)
+    noise = noise_factory(points.shape[-1] + 1, 1, table_size, seed)
+    pixelsize = clamp_pixelsize(pixelsize)
+
+    samples = np.empty(points.shape[:-1] + (points.shape[-1] + 1,))
+    samples[..., -1] = time
+
+    t = 0
+    scale = 1
+    while scale > pixelsize:
+        samples[..., :-1] = points / scale
+        t = t + np.abs(noise.noise_grid(samples) * scale)
+        scale /= 2
+
+    return t
+
+def voxel_centers(start, stop, size, bounds):
+    # Coordinates of the centres of voxels start to stop along an axis that
+    # splits bounds into size voxels
+    low, high = bounds
+    return low + (np.arange(start, stop) + 0.5) * (high - low) / size
+
+def volume_tiles(shape, tile_size):
+    # ((start, stop), ...) ranges of every tile covering an array of shape
+    ranges = [[(start, min(start + tile_size, size)) for start in range(0, size, tile_size)] for size in shape]
+    return list(product(*ranges))
+
+def bake_tile(path, settings, tile):
+    # Computes one tile of a volume and writes it straight into the memory
+    # mapped file, which every worker has open at once
+    shape = settings['shape']
+    axes = [voxel_centers(start, stop, size, bounds) for (start, stop), size, bounds in zip(tile, shape, settings['bounds'])]
+    points = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+
+    # point Point = P / scale + translation;
+    points = points / settings['scale'] + settings['translation']
+
+    if settings['kind'] == 'turbulence':
+        values = turbulence(points, settings['time'], settings['pixelsize'], settings['table_size'], settings['seed'])
+    else:
+        values = noise_factory(len(shape), settings['octaves'], settings['table_size'], settings['seed']).noise_grid(points)
+
+    volume = np.load(path, mmap_mode='r+')
+    volume[tuple(slice(start, stop) for start, stop in tile)] = values
+    volume.flush()
+
+def bake_volume(path, shape, bounds, kind='turbulence', time=0.0, pixelsize=0.2, scale=1.0, translation=None, octaves=1, table_size=256, seed=0, tile_size=32, processes=None):
+    # Bakes turbulence, or plain noise with kind='noise', over a grid of
+    # shape voxels spanning bounds, one (low, high) pair per axis, into a
+    # float32 .npy file at path. The grid is split into tiles that are
+    # computed across a pool of processes, each writing its tile into the
+    # memory mapped file. Returns the volume mapped read-only.
+    shape = tuple(shape)
+    settings = {
+        'shape': shape,
+        'bounds': [tuple(b) for b in bounds],
+        'kind': kind,
+        'time': time,
+        'pixelsize': pixelsize,
+        'scale': scale,
+        'translation': np.zeros(len(shape)) if translation is None else np.asarray(translation, dtype=float),
+        'octaves': octaves,
+        'table_size': table_size,
+        'seed': seed,
+    }
+
+    # Creating the file writes its header; the workers fill in the data
+    np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape).flush()
+
+    for _ in process_map(partial(bake_tile, path, settings), volume_tiles(shape, tile_size), processes):
+        pass
+
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,227 @@
+import math
+from typing import Any
+
+import numpy as np
+
+class Vector2(object):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __add__(self, other: 'Vector2'):
+        return Vector2(self.x + other.x, self.y + other.y)
+
+    def __iadd__(self, other: 'Vector2'):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __mul__(self, other: Any):
+        if type(other) is type(self):
+            return self.x * other.x + self.y * other.y
+        else:
+            return Vector2(other * self.x, other * self.y)
+
+    def __rmul__(self, other: Any):
+        return self.__mul__(other)
+
+    def __imul__(self, other: float):
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __sub__(self, other: 'Vector2'):
+        return Vector2(self.x - other.x, self.y - other.y)
+
+    def __isub__(self, other: 'Vector2'):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __neg__(self):
+        return Vector2(-1 * self.x, -1 * self.y)
+
+    def __abs__(self):
+        return math.sqrt(self.x * self.x + self.y * self.y)
+
+    def __str__(self):
+        return "({0},{1})".format(self.x, self.y)
+
+    def copy(self):
+        return Vector2(self.x, self.y)
+
+    def normalize(self):
+        return self.__mul__(1/ self.__abs__())
+
+    def project(self, other: 'Vector2'):
+        normal = other.normalize()
+        return normal * self.__mul__(normal)
+
+    def to_list(self):
+        return [self.x, self.y]
+
+class Vector3(object):
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __add__(self, other: 'Vector3'):
+        return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __iadd__(self, other: 'Vector3'):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __mul__(self, other: Any):
+        if type(other) is type(self):
+            return self.x * other.x + self.y * other.y + self.z * other.z
+        else:
+            return Vector3(other * self.x, other * self.y, other * self.z)
+
+    def __rmul__(self, other: Any):
+        return self.__mul__(other)
+
+    def __imul__(self, other: float):
+        self.x *= other
+        self.y *= other
+        self.z *= other
+        return self
+
+    def __sub__(self, other: 'Vector3'):
+        return Vector3(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __isub__(self, other: 'Vector3'):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __neg__(self):
+        return Vector3(-1 * self.x, -1 * self.y, -1 * self.z)
+
+    def __abs__(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def copy(self):
+        return Vector3(self.x, self.y, self.z)
+
+    def normalize(self):
+        return self.__mul__(1/ self.__abs__())
+
+    def project(self, other: 'Vector3'):
+        normal = other.normalize()
+        return normal * self.__mul__(normal)
+
+    def __str__(self):
+        return "({0},{1},{2})".format(self.x, self.y, self.z)
+
+    def __pow__(self, other: 'Vector3'):
+        return Vector3(self.y * other.z - other.y * self.z, - self.x * other.z + other.x * self.z, self.x * other.y - other.x * self.y)
+
+    def to_list(self):
+        return [self.x, self.y, self.z]
+
+class VectorArray(object):
+    # A batch of vectors stored as one (N, dimension) float array
+    __slots__ = ('data',)
+
+    dimension = 3
+    element = Vector3
+
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=float).reshape(-1, self.dimension)
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        return cls([v.to_list() for v in vectors])
+
+    @classmethod
+    def zeros(cls, n):
+        return cls(np.zeros((n, cls.dimension)))
+
+    def _operand(self, other):
+        if isinstance(other, VectorArray):
+            return other.data
+        elif isinstance(other, self.element):
+            return np.array(other.to_list())
+        else:
+            # Scalars broadcast over everything, (N,) arrays over rows
+            other = np.asarray(other, dtype=float)
+            return other[:, None] if other.ndim == 1 else other
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        return self.element(*self.data[i].tolist())
+
+    def __iter__(self):
+        for row in self.data.tolist():
+            yield self.element(*row)
+
+    def __add__(self, other):
+        return type(self)(self.data + self._operand(other))
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __iadd__(self, other):
+        self.data += self._operand(other)
+        return self
+
+    def __sub__(self, other):
+        return type(self)(self.data - self._operand(other))
+
+    def __isub__(self, other):
+        self.data -= self._operand(other)
+        return self
+
+    def __mul__(self, other):
+        if isinstance(other, (VectorArray, self.element)):
+            return np.sum(self.data * self._operand(other), axis=-1)
+        else:
+            return type(self)(self.data * self._operand(other))
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __imul__(self, other):
+        self.data *= self._operand(other)
+        return self
+
+    def __neg__(self):
+        return type(self)(-self.data)
+
+    def __abs__(self):
+        return np.sqrt(np.sum(self.data * self.data, axis=-1))
+
+    def copy(self):
+        return type(self)(self.data.copy())
+
+    def normalize(self):
+        return type(self)(self.data / self.__abs__()[:, None])
+
+    def to_list(self):
+        return self.data.tolist()
+
+class Vector2Array(VectorArray):
+    __slots__ = ()
+
+    dimension = 2
+    element = Vector2
+
+class Vector3Array(VectorArray):
+    __slots__ = ()
+
+    dimension = 3
+    element = Vector3
+
+    def __pow__(self, other):
+        return Vector3Array(np.cross(self.data, self._operand(other)))
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from common.turbulence import bake_volume
+
+class VolumeCache(object):
+    # Baked turbulence volumes on disk, one per time slice. Times are
+    # rounded to time_step, so every frame that falls in a slice shares it,
+    # and the volume covers bounds in noise space, so frames that only move
+    # the texture by a different translation share it as well. Files are
+    # ordered from least to most recently used by their modification times,
+    # which get() refreshes, and the oldest slices are deleted once the
+    # folder holds more than max_bytes.
+    prefix = 'turbulence_'
+
+    def __init__(self, folder, shape, bounds, pixelsize=0.2, time_step=0.001, max_bytes=2 << 30, table_size=256, seed=0, processes=None):
+        self.folder = folder
+        self.shape = tuple(shape)
+        self.bounds = [tuple(b) for b in bounds]
+        self.pixelsize = pixelsize
+        self.time_step = time_step
+        self.max_bytes = max_bytes
+        self.table_size = table_size
+        self.seed = seed
+        self.processes = processes
+
+    def slice_time(self, time):
+        return round(time / self.time_step) * self.time_step
+
+    def key(self, time):
+        # Everything the contents of the slice for time depend on
+        settings = [self.shape, self.bounds, self.pixelsize, self.table_size, self.seed, round(self.slice_time(time), 12)]
+        return hashlib.sha256(json.dumps(settings).encode('utf-8')).hexdigest()[:32]
+
+    def path(self, key, extension='.npy'):
+        # Files derived from a slice, like images of it, share its key so
+        # that they are evicted along with it
+        return os.path.join(self.folder, self.prefix + key + extension)
+
+    def files(self, key=''):
+        # Names of the finished files of the slice with key, or of every
+        # slice, leaving out bakes still in progress in any process
+        return [name for name in os.listdir(self.folder) if name.startswith(self.prefix + key) and '.tmp.' not in name]
+
+    def touch(self, key):
+        for name in self.files(key):
+            os.utime(os.path.join(self.folder, name))
+
+    def get(self, time, evict=True):
+        # The key of the slice for time and its volume, baked if it isn't
+        # cached yet. Callers that write files of their own for a new slice
+        # pass evict=False and call evict(key) once those are written, so
+        # that they count towards max_bytes.
+        os.makedirs(self.folder, exist_ok=True)
+        key = self.key(time)
+        path = self.path(key)
+
+        if os.path.exists(path):
+            self.touch(key)
+        else:
+            # Baked under a temporary name so an interrupted bake is never
+            # mistaken for a finished one
+            temporary = self.path(key, '.{0}.tmp.npy'.format(os.getpid()))
+            # The memmap bake_volume returns is dropped at once, since an open
+            # map keeps os.replace from moving the file on Windows
+            bake_volume(temporary, self.shape, self.bounds, time=self.slice_time(time), pixelsize=self.pixelsize, table_size=self.table_size, seed=self.seed, processes=self.processes)
+            os.replace(temporary, path)
+            if evict:
+                self.evict(key)
+
+        return key, np.load(path, mmap_mode='r')
+
+    def entries(self):
+        # {key: (last use, bytes)} of every slice in the folder
+        entries = {}
+        for name in self.files():
+            key = name[len(self.prefix):].split('.')[0]
+            stat = os.stat(os.path.join(self.folder, name))
+            used, size = entries.get(key, (0, 0))
+            entries[key] = (max(used, stat.st_mtime), size + stat.st_size)
+        return entries
+
+    def evict(self, keep=None):
+        # Deletes the least recently used slices, never keep, until the
+        # folder fits in max_bytes
+        entries = self.entries()
+        total = sum(size for used, size in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key][0]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for name in self.files(key):
+                os.remove(os.path.join(self.folder, name))
+            total -= entries[key][1]
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+from common.sweep import make_circle, make_ring, sample_spine, shape_morph, shell
+from common.vector import Vector2, Vector3
+
+# The seashells from the midterm submission as shell specs. The functions
+# live at the top level of this module so the specs can be pickled and built
+# by generate_shells in worker processes. Like the submission every ring is
+# closed, so the circles come from make_ring rather than make_circle.
+
+def coiling_rate(n):
+    return n * math.pi / 18
+
+# Tubular Shell
+def tubular_growth(n):
+    return 0.0005 * n ** 2
+
+# Classical shell
+def classical_displacement(n):
+    return 5 * 1.01 ** (n - 300)
+
+def classical_growth(n):
+    return 1.01 ** (n - 300)
+
+# spherical shell
+def spherical_displacement(n):
+    return 0.35 * 1.5 * 1.03 ** (n - 300)
+
+def spherical_growth(n):
+    return 0.35 * 1.03 ** (n - 300)
+
+# custom generating curve shells
+def custom_displacement(n):
+    return 0.5 * 1.5 * 1.03 ** (n - 300)
+
+def custom_scaling_factor(n):
+    return 0.5 * (1.03 ** (n - 300)) / 6
+
+# Patelliform Shell
+def patelliform_growth(n):
+    return 0.0075 * 1.34 ** (n - 300)
+
+# Horn, a tubular shell bent along a quarter circle
+def horn_spine(t):
+    return np.stack([10 * (1 - np.cos(t)), np.zeros_like(t), 10 * np.sin(t)], axis=-1)
+
+def horn_growth(n):
+    return 0.02 * n
+
+generating_curve = [
+    Vector2(0,-6), Vector2(0,-4), Vector2(0,-2), Vector2(0,0), Vector2(0,2), Vector2(0,4), Vector2(0,6),
+    Vector2(0.2, 6.3), Vector2(0.4, 6.1), Vector2(0.672, 5.5), Vector2(0.845, 5), Vector2(1, 4), Vector2(2, 2),
+    Vector2(3.394, 0), Vector2(4.363, -2), Vector2(3.394, -4), Vector2(1.104, -6), Vector2(0.4, -6.4), Vector2(0.2, -6.3)
+]
+
+inner_curve = [
+    Vector2(0,-6), Vector2(0,-4), Vector2(0,-2), Vector2(0,0), Vector2(0,2), Vector2(0,4), Vector2(0,6),
+    Vector2(0.2, 6.3), Vector2(0.4, 6.1), Vector2(0.672, 5.5), Vector2(0.845, 5), Vector2(1 * 0.75, 4), Vector2(2 * 0.75, 2),
+    Vector2(3.394 * 0.75, 0), Vector2(4.363 * 0.75, -2), Vector2(3.394 * 0.75, -4), Vector2(1.104 * 0.75, -6), Vector2(0.4, -6.4), Vector2(0.2, -6.3)
+]
+
+outer_curve = [
+    Vector2(0,-6), Vector2(0,-4), Vector2(0,-2), Vector2(0,0), Vector2(0,2), Vector2(0,4), Vector2(0,6),
+    Vector2(0.2, 6.3), Vector2(0.4, 6.1), Vector2(0.672,5.5), Vector2(0.845*1.25, 4.5), Vector2(2,4), Vector2(3.5,3),
+    Vector2(5,1), Vector2(5.2,-2), Vector2(3.394*1.25,-4), Vector2(2,-5.5), Vector2(0.8,-6.4), Vector2(0.2, -6.3)
+]
+
+def catalogue():
+    tangent = Vector3(0,0,1)
+    normal = Vector3(1,0,0)
+    circle = make_ring(1, 20)
+
+    return [
+        shell(Vector3(0,0,10), tangent, normal, coiling_rate, 0, tubular_growth, tubular_growth, circle, 109, closed=True),
+        shell(Vector3(20,0,0), tangent, normal, coiling_rate, classical_displacement, classical_growth, classical_growth, circle, 400, closed=True),
+        shell(Vector3(35,0,0), tangent, normal, coiling_rate, spherical_displacement, spherical_growth, spherical_growth, circle, 400, closed=True),
+        shell(Vector3(55,0,0), tangent, normal, coiling_rate, custom_displacement, 0, custom_scaling_factor, generating_curve, 400, closed=True),
+        # Varying generating curve: the inner curve opens out to the outer
+        # one over the last five rings
+        shell(Vector3(70,0,0), tangent, normal, coiling_rate, custom_displacement, 0, custom_scaling_factor, shape_morph([inner_curve, inner_curve, outer_curve], [0, 395, 400]), 400, closed=True),
+        shell(Vector3(80,0,10), Vector3(0,1,0), normal, coiling_rate, 0, patelliform_growth, patelliform_growth, circle, 325, closed=True),
+    ]
+
+def horns():
+    return [
+        shell(Vector3(100,0,0), Vector3(0,0,1), Vector3(1,0,0), 0, horn_growth, 0, horn_growth, make_circle(1, 20), 800, spine=sample_spine(horn_spine, 0, math.pi / 2) + [100, 0, 0]),
+    ]
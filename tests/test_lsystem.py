@@ -0,0 +1,81 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common import bpy_stub
+
+bpy = bpy_stub.install()
+from common.lsystem import LSystem, ProductionRule, Turtle
+from common.vector import Vector3
+
+tree_rules = [
+    ProductionRule('S', ['BBBB&A', 'BB&BA', 'B&BB&BA', 'BB&BB&BA']),
+    ProductionRule('A', ['[&&BF]////////[&BF]']),
+    ProductionRule('F', ['F[+++L][---L]A', '//&F', '\\&F', 'F//[+++L]\\\\[---L]A']),
+]
+
+
+def apply_in_order(rules, word, n):
+    # The original derivation: each rule rewrites the whole word in turn
+    for i in range(n):
+        for rule in rules:
+            word = rule.apply(word)
+    return word
+
+
+def all_words(rules, word, n):
+    # Every word apply_in_order can derive, whatever the choices
+    words = {word}
+    for i in range(n):
+        for rule in rules:
+            rewritten = set()
+            for word in words:
+                pieces = [rule.outputs if c == rule.input else [c] for c in word]
+                rewritten.update("".join(choice) for choice in itertools.product(*pieces))
+            words = rewritten
+    return words
+
+
+def test_iterate_matches_rule_order_for_deterministic_rules():
+    grammars = [
+        ([ProductionRule('A', ['AB']), ProductionRule('B', ['A'])], 'A'),
+        ([ProductionRule('F', ['F+G']), ProductionRule('G', ['F-G']), ProductionRule('F', ['FF'])], 'F'),
+        ([ProductionRule('A', ['[&FA]/////[&FA]///////[&FA]'])], 'A'),
+    ]
+    for rules, axiom in grammars:
+        assert LSystem(rules, axiom).iterate(4) == apply_in_order(rules, axiom, 4)
+
+
+def test_iterate_derives_the_words_rule_order_can():
+    rules = [
+        ProductionRule('S', ['BA', 'B&BA']),
+        ProductionRule('A', ['[F]F']),
+        ProductionRule('F', ['F[L]', '&F']),
+    ]
+    words = {LSystem(rules, 'S', seed=seed).iterate(2) for seed in range(500)}
+    assert words == all_words(rules, 'S', 2)
+
+
+def test_every_path_derives_the_same_word_for_a_seed():
+    for seed in (5, 479):
+        word = LSystem(tree_rules, 'S', seed=seed).iterate(5)
+        assert "".join(LSystem(tree_rules, 'S', seed=seed).generate(5)) == word
+        assert LSystem(tree_rules, 'S', seed=0).forest(5, [seed]) == [word]
+        assert LSystem(tree_rules, 'S', seed=seed).expand('S', 5) == word
+
+
+def drawn_vertices(draw):
+    turtle = Turtle(Vector3(0, 0, 0), Vector3(0, 0, 1), Vector3(0, 1, 0))
+    count = len(bpy.data.meshes)
+    draw(turtle)
+    return np.concatenate([mesh.vertices.values['co'] for mesh in bpy.data.meshes[count:]])
+
+
+def test_turtle_draws_the_word_iterate_derives():
+    word = LSystem(tree_rules, 'S', seed=479).iterate(5)
+    expected = drawn_vertices(lambda turtle: turtle.process_word(word))
+    drawn = drawn_vertices(lambda turtle: turtle.process_lsystem(LSystem(tree_rules, 'S', seed=479), 5))
+    np.testing.assert_allclose(drawn, expected, atol=1e-6)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common import bpy_stub
+
+bpy = bpy_stub.install()
+from common.mesh import write_mesh
+from common.topology import grid_topology
+
+
+def loop_edges(mesh):
+    edges = mesh.edges.values['vertices'].reshape(-1, 2)
+    return edges[mesh.loops.values['edge_index']]
+
+
+def test_write_mesh_links_loops_to_given_edges():
+    vertices = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)]
+    edges = [(0, 1), (1, 2), (2, 3), (3, 0)]
+    mesh = write_mesh(bpy.data.meshes.new('quad'), vertices, edges, [[0, 1, 2, 3]])
+
+    assert len(mesh.edges) == 4
+    np.testing.assert_array_equal(loop_edges(mesh), edges)
+
+
+def test_write_mesh_adds_edges_faces_need():
+    vertices = np.random.default_rng(0).random((5 * 8, 3))
+    edges, faces, caps = grid_topology(5, 8, True, False)
+    mesh = write_mesh(bpy.data.meshes.new('grid'), vertices, edges, [faces, caps])
+
+    loops = mesh.loops.values['vertex_index']
+    starts = mesh.polygons.values['loop_start']
+    totals = mesh.polygons.values['loop_total']
+    for start, total in zip(starts, totals):
+        corners = loops[start:start + total]
+        expected = np.stack([corners, np.roll(corners, -1)], axis=1)
+        np.testing.assert_array_equal(np.sort(loop_edges(mesh)[start:start + total], axis=1), np.sort(expected, axis=1))
+
+
+def test_update_rejects_loops_without_edges():
+    mesh = bpy.data.meshes.new('broken')
+    mesh.vertices.add(3)
+    mesh.loops.add(3)
+    mesh.loops.foreach_set('vertex_index', [0, 1, 2])
+    mesh.polygons.add(1)
+    mesh.polygons.foreach_set('loop_start', [0])
+    mesh.polygons.foreach_set('loop_total', [3])
+
+    with pytest.raises(ValueError):
+        mesh.update(calc_edges=False)
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.shell_spec import build_spec, compile_rate, expression, load_specs, spec_hash
+from common.sweep import exponential, polynomial
+
+specs_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'sweeps', 'shells.json')
+
+
+@pytest.mark.parametrize('text', [
+    "().__class__.__base__.__subclasses__()",
+    "n.__class__",
+    "__import__('os').system('true')",
+    "exp.__globals__",
+    "[c for c in ()]",
+    "n[0]",
+    "(lambda: 1)()",
+    "'text'",
+    "sin(n, out=n)",
+])
+def test_escapes_are_rejected(text):
+    with pytest.raises(ValueError):
+        compile_rate(text)
+    with pytest.raises(ValueError):
+        expression(text)
+
+
+@pytest.mark.parametrize('text, constants, kind', [
+    ("n * pi / 18", {}, polynomial),
+    ("0.0005 * n ** 2", {}, polynomial),
+    ("0.5 * (l ** (n - 300)) / 6", {'l': 1.03}, exponential),
+    ("5 * l ** (n - 300)", {'l': 1.01}, exponential),
+    ("sin(n) + where(n > 3, 1, 0)", {}, expression),
+])
+def test_compile_rate_matches_the_expression(text, constants, kind):
+    rate = compile_rate(text, constants)
+    assert isinstance(rate, kind)
+
+    n = np.arange(400, dtype=float)
+    np.testing.assert_allclose(rate(n), expression(text, constants)(n), rtol=1e-12)
+
+
+def test_cached_specs_reload_identical_buffers(tmp_path):
+    spec = load_specs(specs_path)[3]
+    built = build_spec(spec, str(tmp_path))
+    assert os.listdir(str(tmp_path)) == [spec_hash(spec) + '.npz']
+
+    cached = build_spec(spec, str(tmp_path))
+    for a, b in zip(built, cached):
+        np.testing.assert_array_equal(a, b)
+        assert a.dtype == b.dtype
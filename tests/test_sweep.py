@@ -0,0 +1,27 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.sweep import evaluate_array, make_lambda_function
+
+
+def test_evaluate_array_does_not_overflow():
+    n = np.arange(70)
+    np.testing.assert_array_equal(evaluate_array(lambda n: 2 ** n, n), 2.0 ** n)
+    np.testing.assert_array_equal(evaluate_array(lambda n: n ** 8, n), n.astype(float) ** 8)
+
+
+def test_evaluate_array_indexes_tables_with_integers():
+    table = np.linspace(0, 1, 10) ** 2
+    np.testing.assert_array_equal(evaluate_array(lambda n: table[n], np.arange(10)), table)
+
+
+def test_evaluate_array_broadcasts_only_constants():
+    n = np.arange(50)
+    np.testing.assert_array_equal(evaluate_array(make_lambda_function(3), n), np.full(50, 3.0))
+
+    jitter = evaluate_array(lambda n: random.random(), n)
+    assert len(np.unique(jitter)) == len(n)
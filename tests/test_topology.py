@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.topology import grid_topology
+
+
+def face_edges(faces):
+    return {frozenset(pair) for face in faces for pair in zip(face, np.roll(face, -1))}
+
+
+@pytest.mark.parametrize('closed', [False, True])
+@pytest.mark.parametrize('capped', [False, True])
+def test_grid_edges_are_unique_and_cover_the_faces(closed, capped):
+    n_rings, ring_length = 4, 6
+    edges, faces, caps = grid_topology(n_rings, ring_length, closed, capped)
+
+    edge_set = {frozenset(edge) for edge in edges.tolist()}
+    assert len(edge_set) == len(edges)
+
+    n_faces = (n_rings - 1) * (ring_length if closed else ring_length - 1)
+    assert faces.shape == (n_faces, 4)
+    assert len(caps) == (2 if capped else 0)
+
+    # Every edge borders a quad and every quad side is an edge
+    assert face_edges(faces.tolist()) == edge_set
+    if closed:
+        assert face_edges(caps.tolist()) <= edge_set
+
+
+def test_grid_faces_wind_consistently():
+    edges, faces, caps = grid_topology(3, 5, True, True)
+    # Each interior edge is walked once in each direction by the faces on either side
+    directed = [pair for face in faces.tolist() for pair in zip(face, np.roll(face, -1))]
+    directed += [pair for cap in caps.tolist() for pair in zip(cap, np.roll(cap, -1))]
+    assert len(set(directed)) == len(directed)
+    assert {frozenset(pair) for pair in directed} == {frozenset(edge) for edge in edges.tolist()}
+
+
+def test_grid_topology_is_cached_read_only():
+    assert grid_topology(3, 5, True) is grid_topology(3, 5, True)
+    edges = grid_topology(3, 5, True)[0]
+    with pytest.raises(ValueError):
+        edges[0, 0] = 1
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common.volume_cache import VolumeCache
+
+shape = (4, 4, 4)
+bounds = [(0, 1), (0, 1), (0, 1)]
+# Room for two 4 x 4 x 4 float32 slices and their .npy headers
+slice_bytes = 4 ** 3 * 4 + 128
+
+
+def make_cache(folder):
+    return VolumeCache(str(folder), shape, bounds, time_step=0.1, max_bytes=2 * slice_bytes, processes=1)
+
+
+def test_times_in_one_step_share_a_slice(tmp_path):
+    cache = make_cache(tmp_path)
+    key, volume = cache.get(0.21)
+    assert cache.get(0.19)[0] == key
+    assert cache.get(0.31)[0] != key
+    assert volume.shape == shape
+
+
+def test_least_recently_used_slices_are_evicted(tmp_path):
+    cache = make_cache(tmp_path)
+    first = cache.get(0.0)[0]
+    second = cache.get(0.1)[0]
+
+    # Using the first slice again leaves the second as the oldest
+    os.utime(cache.path(second), (1, 1))
+    cache.get(0.0)
+    third = cache.get(0.2)[0]
+
+    assert set(cache.entries()) == {first, third}
+
+
+def test_derived_files_count_and_go_with_their_slice(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.get(0.0, evict=False)[0]
+    with open(cache.path(key, '.exr'), 'wb') as f:
+        f.write(b'\0' * slice_bytes)
+    cache.evict(key)
+
+    os.utime(cache.path(key), (1, 1))
+    os.utime(cache.path(key, '.exr'), (1, 1))
+    cache.get(0.1)
+
+    assert not os.path.exists(cache.path(key, '.exr'))
+    assert list(cache.entries()) == [cache.key(0.1)]
+
+
+def test_bakes_in_progress_are_left_alone(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.key(0.5)
+    temporary = cache.path(key, '.1234.tmp.npy')
+    np.save(temporary, np.zeros((64, 64)))
+
+    cache.get(0.0)
+    cache.get(0.1)
+    cache.get(0.2)
+
+    assert key not in cache.entries()
+    assert os.path.exists(temporary)